@@ -20,8 +20,10 @@ def pipeline_monitor(timeout: int = 300):
 
             try:
                 # 1. S3 Image Loading
-                logging.info(f"Loading image from S3: {s3_key}")
-                original_image = self.load_image_from_s3(s3_key)
+                original_image = kwargs.get('image')
+                if original_image is None:
+                    logging.info(f"Loading image from S3: {s3_key}")
+                    original_image = self.load_image_from_s3(s3_key)
                 status['s3_load'] = True
 
                 # 2. Preprocessing
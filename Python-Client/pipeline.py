@@ -1,8 +1,5 @@
 import numpy as np
-import boto3
-import io
 from tritonclient.grpc import InferenceServerClient, InferInput, InferRequestedOutput
-from PIL import Image
 import torchvision.transforms as transforms
 import logging
 import matplotlib.pyplot as plt
@@ -10,9 +7,16 @@ import seaborn as sns
 from torchvision.utils import make_grid
 import torch
 import os
+import sys
 from datetime import datetime
+from pathlib import Path
 from monitoring import pipeline_monitor
 
+# S3 fetching and image preprocessing are shared with the WebSocket pipeline server
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'triton-eks-ws-server-streaming' / 'python'))
+from s3_fetcher import S3Fetcher
+from preprocessing import IMAGENET_NORMALIZATION, open_image, reduce_image, resize_center_crop
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -21,20 +25,18 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class TritonS3VisionPipeline:
-    def __init__(self, s3_bucket="dry-bean-bucket-c", triton_url='a254e6b35e7374cafa61153fa01a5ae0-291966535.us-east-1.elb.amazonaws.com:8001'):
+    def __init__(self, s3_bucket="dry-bean-bucket-c", triton_url='a254e6b35e7374cafa61153fa01a5ae0-291966535.us-east-1.elb.amazonaws.com:8001',
+                 max_image_pixels=50_000_000):
         self.client = InferenceServerClient(url=triton_url)
-        self.s3 = boto3.client('s3')
+        # Images larger than this are rejected before any pixels are decoded
+        self.max_image_pixels = max_image_pixels
+        self.s3_fetcher = S3Fetcher()
+        self.s3 = self.s3_fetcher.s3_client
         self.bucket = s3_bucket
 
-        self.preprocess = transforms.Compose([
-            transforms.Resize(256),
-            transforms.CenterCrop(224),
-            transforms.ToTensor(),
-            transforms.Normalize(
-                mean=[0.485, 0.456, 0.406],
-                std=[0.229, 0.224, 0.225]
-            )
-        ])
+        # Resize(256) + CenterCrop(224) + ToTensor() + ImageNet Normalize(),
+        # written in one pass per channel straight into the model input
+        self.normalization = IMAGENET_NORMALIZATION
 
         self.models = {
             "densenet": {"model_name": "densenet_onnx", "input_name": "data_0", "output_name": "fc6_1"},
@@ -100,15 +102,19 @@ class TritonS3VisionPipeline:
 
     def load_image_from_s3(self, s3_key):
         logger.info(f"Loading image from S3: {s3_key}")
-        response = self.s3.get_object(Bucket=self.bucket, Key=s3_key)
-        image_bytes = response['Body'].read()
-        image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-        return image
+        image_bytes = self.s3_fetcher.get(self.bucket, s3_key).body
+        # Full size: this is the original that gets saved and visualized
+        return open_image(image_bytes, self.max_image_pixels).convert('RGB')
 
     def preprocess_image(self, image):
         logger.info("Preprocessing image")
-        img_tensor = self.preprocess(image)
-        return img_tensor.numpy()[None, ...]
+        # Scale down cheaply first, keeping both sides >= 256 so Resize(256)
+        # + CenterCrop(224) still have enough pixels
+        image = reduce_image(image, (256, 256))
+        image = resize_center_crop(image, 256, 224)
+        input_data = np.empty((1, 3, 224, 224), dtype=np.float32)
+        self.normalization.apply(image, input_data)
+        return input_data
 
     def process_model(self, input_data, model_config):
         logger.info(f"Processing with model: {model_config['model_name']}")
@@ -247,12 +253,12 @@ class TritonS3VisionPipeline:
         logger.info(f"Saved original image to {filename}")
 
     @pipeline_monitor(timeout=300)
-    def run_pipeline_with_viz(self, s3_key):
+    def run_pipeline_with_viz(self, s3_key, image=None):
         """Run the pipeline and save visualizations."""
         logger.info("Running vision pipeline with visualizations")
 
-        # Load original image
-        original_image = self.load_image_from_s3(s3_key)
+        # Load original image unless the caller already fetched it
+        original_image = image if image is not None else self.load_image_from_s3(s3_key)
 
         # Save original image and preprocessing steps
         self.save_original_image(original_image, s3_key)
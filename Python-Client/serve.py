@@ -71,11 +71,12 @@ def predict():
         s3_key = data['s3_key']
         logger.info(f"Starting processing for S3 key: {s3_key}")
 
-        # Test S3 access before processing
+        # Fetch the image up front; the single GET doubles as the S3 access
+        # check and the pipeline reuses the image instead of fetching again
         try:
-            logger.debug("Testing S3 bucket access...")
-            pipeline.s3.head_object(Bucket=pipeline.bucket, Key=s3_key)
-            logger.debug("S3 bucket access successful")
+            logger.debug("Fetching image from S3...")
+            image = pipeline.load_image_from_s3(s3_key)
+            logger.debug("S3 fetch successful")
         except Exception as e:
             logger.error(f"S3 access error: {str(e)}")
             return jsonify({'error': f'S3 access error: {str(e)}'}), 500
@@ -84,7 +85,7 @@ def predict():
         logger.info("Starting pipeline execution")
         pipeline_start = time.time()
         try:
-            densenet_output, resnet_output = pipeline.run_pipeline_with_viz(s3_key)
+            densenet_output, resnet_output = pipeline.run_pipeline_with_viz(s3_key, image=image)
             pipeline_duration = time.time() - pipeline_start
             logger.info(f"Pipeline execution completed in {pipeline_duration:.2f} seconds")
         except Exception as e:
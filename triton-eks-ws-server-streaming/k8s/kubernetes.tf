@@ -35,6 +35,12 @@ resource "kubernetes_deployment" "triton" {
         labels = {
           app = "triton-server"
         }
+        # WebSocket server metrics (Triton's own stay on 8002)
+        annotations = {
+          "prometheus.io/scrape" = "true"
+          "prometheus.io/port"   = "8081"
+          "prometheus.io/path"   = "/metrics"
+        }
       }
       spec {
         service_account_name = "triton-service-account"
@@ -66,6 +72,19 @@ resource "kubernetes_deployment" "triton" {
             value = "none"
           }
 
+          # Preprocessing processes for the WebSocket server, matched to the
+          # container CPU limit below and split between its worker processes
+          # (start.sh runs one per CPU; set WS_WORKERS to override)
+          env {
+            name = "PREPROCESS_WORKERS"
+            value_from {
+              resource_field_ref {
+                container_name = "triton-server"
+                resource       = "limits.cpu"
+              }
+            }
+          }
+
           port {
             container_port = 8000
             name           = "http"
@@ -82,6 +101,10 @@ resource "kubernetes_deployment" "triton" {
             container_port = 8080
             name           = "websocket"
           }
+          port {
+            container_port = 8081
+            name           = "ws-metrics"
+          }
 
           startup_probe {
             http_get {
@@ -7,8 +7,27 @@ tritonserver --model-repository=s3://dry-bean-bucket-c/models \
             --metrics-port=8002 \
             --allow-http=1 &
 
-# Wait for Triton server to start
+# Give Triton a head start; each server worker also waits (up to its
+# startup_timeout) until Triton serves its models' metadata
 sleep 10
 
-# Start WebSocket server
-python3 /app/pipeline_ws_server.py
+# Number of CPUs the container may use: the cgroup quota rounded up, or all
+# CPUs if there is no limit
+cpu_limit() {
+    local quota period
+    if [ -f /sys/fs/cgroup/cpu.max ]; then
+        read -r quota period < /sys/fs/cgroup/cpu.max
+    elif [ -f /sys/fs/cgroup/cpu/cpu.cfs_quota_us ]; then
+        quota=$(cat /sys/fs/cgroup/cpu/cpu.cfs_quota_us)
+        period=$(cat /sys/fs/cgroup/cpu/cpu.cfs_period_us)
+    fi
+    if [ -n "$quota" ] && [ "$quota" != "max" ] && [ "$quota" -gt 0 ]; then
+        echo $(( (quota + period - 1) / period ))
+    else
+        nproc
+    fi
+}
+
+# Start the WebSocket server: one worker process per CPU unless WS_WORKERS is set
+WS_WORKERS=${WS_WORKERS:-$(cpu_limit)}
+exec python3 /app/server_launcher.py --workers "$WS_WORKERS"
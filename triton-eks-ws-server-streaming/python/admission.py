@@ -0,0 +1,110 @@
+import asyncio
+import time
+from collections import deque
+
+
+class AdmissionController:
+    """Global in-flight limit with a bounded, time-limited wait queue.
+
+    Up to `max_inflight` requests run at once. Beyond that, up to
+    `max_queued` requests wait (first come, first served) for at most
+    `max_queue_wait` seconds. Requests that find the queue full, wait too
+    long, or arrive while Triton's reported queue time is above
+    `triton_queue_threshold` seconds are shed, so the caller can answer
+    with an immediate "overloaded" reply instead of a slow timeout.
+    """
+
+    def __init__(self, max_inflight=256, max_queued=512, max_queue_wait=1.0,
+                 triton_queue_threshold=0.5, min_retry_after=0.05, max_retry_after=5.0):
+        self.max_inflight = max_inflight
+        self.max_queued = max_queued
+        self.max_queue_wait = max_queue_wait
+        self.triton_queue_threshold = triton_queue_threshold
+        self.min_retry_after = min_retry_after
+        self.max_retry_after = max_retry_after
+        self.inflight = 0
+        self._waiters = deque()
+        # Average queue time Triton reported over the last poll, in seconds
+        self.triton_queue_time = 0.0
+        # Moving average of how long an admitted request holds its slot
+        self._service_time = None
+        self.admitted = 0
+        self.rejected = 0
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def triton_overloaded(self):
+        return bool(self.triton_queue_threshold) and self.triton_queue_time > self.triton_queue_threshold
+
+    async def acquire(self):
+        """Wait for a slot; return its start time, or None if the request is shed."""
+        if self.triton_overloaded():
+            return self._reject()
+        if self.inflight < self.max_inflight and not self._waiters:
+            self.inflight += 1
+            return self._admit()
+        if len(self._waiters) >= self.max_queued:
+            return self._reject()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # release() hands its slot straight to the waiter, so a shielded
+            # waiter is never lost to the timeout cancelling it
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_queue_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done():
+                # The slot arrived just as we gave up; pass it on
+                self._release_slot()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return self._reject()
+        return self._admit()
+
+    def release(self, started):
+        """Return the slot taken by acquire()."""
+        elapsed = time.monotonic() - started
+        if self._service_time is None:
+            self._service_time = elapsed
+        else:
+            self._service_time += 0.1 * (elapsed - self._service_time)
+        self._release_slot()
+
+    def retry_after(self):
+        """Seconds a shed client should wait before retrying."""
+        # Time for the current backlog to drain at the observed service rate
+        backlog = (self.inflight + len(self._waiters)) / max(1, self.max_inflight)
+        estimate = backlog * (self._service_time or self.min_retry_after)
+        if self.triton_overloaded():
+            estimate = max(estimate, self.triton_queue_time)
+        return min(self.max_retry_after, max(self.min_retry_after, estimate))
+
+    def stats(self):
+        return {
+            'inflight': self.inflight,
+            'queued': len(self._waiters),
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'triton_queue_time': self.triton_queue_time
+        }
+
+    def _admit(self):
+        self.admitted += 1
+        return time.monotonic()
+
+    def _reject(self):
+        self.rejected += 1
+        return None
+
+    def _release_slot(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.inflight -= 1
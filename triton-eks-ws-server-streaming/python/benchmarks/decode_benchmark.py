@@ -0,0 +1,112 @@
+"""Decode time and peak RSS of the image preprocessing decode paths.
+
+Compares the original path (full-resolution decode, then resize to 224x224)
+with preprocessing.decode_image() (DCT-domain downscaling while decoding) on
+synthetic 4K and 12 MP JPEGs. Every (path, image) pair runs in a fresh
+process so the reported peak RSS belongs to that path alone.
+
+    python3 benchmarks/decode_benchmark.py [--repeat 20]
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+IMAGES = {
+    '4K (3840x2160)': (3840, 2160),
+    '12MP (4000x3000)': (4000, 3000)
+}
+
+
+def make_jpeg(width, height, image_path):
+    """Write a photo-like JPEG: smooth gradients plus mild noise."""
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    pixels = np.stack([
+        np.broadcast_to(x, (height, width)),
+        np.broadcast_to(y, (height, width)),
+        (x + y) / 2
+    ], axis=-1)
+    pixels += rng.normal(0, 12, pixels.shape).astype(np.float32)
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(image_path, 'JPEG', quality=90)
+
+
+def decode_original(image_bytes):
+    image = Image.open(io.BytesIO(image_bytes))
+    image = image.resize((224, 224))
+    return image.convert('RGB')
+
+
+def decode_draft(image_bytes):
+    from preprocessing import decode_image
+    return decode_image(image_bytes, (224, 224))
+
+
+PATHS = {
+    'original': decode_original,
+    'draft': decode_draft
+}
+
+
+def _measure(path_name, image_path, repeat, results):
+    with open(image_path, 'rb') as f:
+        image_bytes = f.read()
+    decode = PATHS[path_name]
+    # Import and warm up outside the measured region
+    decode(image_bytes)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decode(image_bytes)
+        timings.append(time.perf_counter() - start)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((statistics.median(timings), max(timings), peak_kb))
+
+
+def run_in_child(target, *args):
+    # Linux carries ru_maxrss over from the parent across fork and exec, so
+    # the parent must never hold a full-resolution image itself.
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=target, args=args + (results,))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def _make_jpeg(width, height, image_path, results):
+    make_jpeg(width, height, image_path)
+    results.put(os.path.getsize(image_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'image':<18} {'path':<9} {'median ms':>10} {'max ms':>8} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, (width, height) in IMAGES.items():
+            image_path = os.path.join(tmp, f"{width}x{height}.jpg")
+            run_in_child(_make_jpeg, width, height, image_path)
+            for path_name in PATHS:
+                median, worst, peak_kb = run_in_child(_measure, path_name, image_path, args.repeat)
+                print(f"{label:<18} {path_name:<9} {median * 1000:>10.1f} {worst * 1000:>8.1f} "
+                      f"{peak_kb / 1024:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+"""A stand-in Triton server for transport benchmarks.
+
+Serves the KServe v2 HTTP endpoints (with binary tensor data) and the gRPC
+GRPCInferenceService for the server's default models. Inference sleeps for
+`delay` seconds and returns zeros of the model's output shape, so what is
+measured is the transport, not the model. System shared-memory regions can
+be registered over either protocol and used for inputs and outputs, like
+Triton's own.
+
+    python3 benchmarks/fake_triton.py --http-port 8000 --grpc-port 8001
+"""
+import argparse
+import asyncio
+import json
+from multiprocessing import resource_tracker, shared_memory
+
+import grpc
+import numpy as np
+from aiohttp import web
+from tritonclient.grpc import model_config_pb2, service_pb2, service_pb2_grpc
+
+# Model name -> (input name, output name, output shape without the batch dimension)
+MODELS = {
+    'densenet_onnx': ('data_0', 'fc6_1', [1000, 1, 1]),
+    'resnet50_onnx': ('data', 'resnetv24_dense0_fwd', [1000])
+}
+MAX_BATCH_SIZE = 8
+INPUT_SHAPE = [3, 224, 224]
+
+
+def model_metadata(model_name):
+    input_name, output_name, output_shape = MODELS[model_name]
+    return {
+        'name': model_name,
+        'versions': ['1'],
+        'platform': 'onnxruntime_onnx',
+        'inputs': [{'name': input_name, 'datatype': 'FP32', 'shape': [-1] + INPUT_SHAPE}],
+        'outputs': [{'name': output_name, 'datatype': 'FP32', 'shape': [-1] + output_shape}]
+    }
+
+
+class SharedMemoryRegion:
+    """A client's registered region, attached by key."""
+
+    def __init__(self, key, offset, byte_size):
+        self.memory = shared_memory.SharedMemory(name=key.lstrip('/'))
+        # The client owns the region; don't let this process unlink it on exit
+        resource_tracker.unregister(self.memory._name, 'shared_memory')
+        self.offset = offset
+        self.byte_size = byte_size
+
+    def read(self, offset, byte_size):
+        start = self.offset + offset
+        return bytes(self.memory.buf[start:start + byte_size])
+
+    def write(self, offset, data):
+        start = self.offset + offset
+        self.memory.buf[start:start + len(data)] = data
+
+    def close(self):
+        self.memory.close()
+
+
+def output_bytes(model_name, batch_size):
+    _, output_name, output_shape = MODELS[model_name]
+    shape = [batch_size] + output_shape
+    return output_name, shape, np.zeros(shape, dtype=np.float32).tobytes()
+
+
+class FakeTriton:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.inferences = 0
+        self.regions = {}
+        # Inferences whose input came through shared memory
+        self.shared_memory_inferences = 0
+        # Each inference's request timeout in microseconds (None if unset)
+        self.timeouts = []
+
+    async def infer(self, model_name, batch_size, timeout=None):
+        self.inferences += 1
+        self.timeouts.append(timeout)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return output_bytes(model_name, batch_size)
+
+    def register_region(self, name, key, offset, byte_size):
+        if name in self.regions:
+            raise ValueError(f"shared memory region '{name}' already in manager")
+        self.regions[name] = SharedMemoryRegion(key, offset, byte_size)
+
+    def unregister_region(self, name=''):
+        for region_name in [name] if name else list(self.regions):
+            region = self.regions.pop(region_name, None)
+            if region is not None:
+                region.close()
+
+    def region_status(self):
+        return [
+            {'name': name, 'key': '/' + region.memory.name, 'offset': region.offset, 'byte_size': region.byte_size}
+            for name, region in self.regions.items()
+        ]
+
+    def read_input(self, parameters):
+        """Input bytes from the shared memory named in a tensor's parameters."""
+        self.shared_memory_inferences += 1
+        region = self.regions[parameters['shared_memory_region']]
+        return region.read(parameters.get('shared_memory_offset', 0), parameters['shared_memory_byte_size'])
+
+    def write_output(self, parameters, data):
+        region = self.regions[parameters['shared_memory_region']]
+        if len(data) > parameters['shared_memory_byte_size']:
+            raise ValueError("output does not fit its shared memory region")
+        region.write(parameters.get('shared_memory_offset', 0), data)
+
+    # --- HTTP ---
+
+    def http_app(self):
+        app = web.Application(client_max_size=1 << 30)
+        app.router.add_get('/v2/health/ready', self._http_ready)
+        app.router.add_get('/v2/models/{model}', self._http_metadata)
+        app.router.add_get('/v2/models/{model}/versions/{version}', self._http_metadata)
+        app.router.add_get('/v2/models/{model}/config', self._http_config)
+        app.router.add_get('/v2/models/{model}/versions/{version}/config', self._http_config)
+        app.router.add_post('/v2/models/{model}/infer', self._http_infer)
+        app.router.add_post('/v2/models/{model}/versions/{version}/infer', self._http_infer)
+        app.router.add_post('/v2/repository/index', self._http_index)
+        app.router.add_get('/v2/models/stats', self._http_stats)
+        app.router.add_get('/v2/systemsharedmemory/status', self._http_shm_status)
+        app.router.add_post('/v2/systemsharedmemory/region/{region}/register', self._http_shm_register)
+        app.router.add_post('/v2/systemsharedmemory/region/{region}/unregister', self._http_shm_unregister)
+        app.router.add_post('/v2/systemsharedmemory/unregister', self._http_shm_unregister)
+        return app
+
+    async def _http_ready(self, request):
+        return web.Response()
+
+    async def _http_metadata(self, request):
+        return web.json_response(model_metadata(request.match_info['model']))
+
+    async def _http_config(self, request):
+        return web.json_response({'name': request.match_info['model'], 'max_batch_size': MAX_BATCH_SIZE})
+
+    async def _http_index(self, request):
+        return web.json_response([{'name': name, 'version': '1', 'state': 'READY'} for name in MODELS])
+
+    async def _http_stats(self, request):
+        return web.json_response({'model_stats': []})
+
+    async def _http_shm_status(self, request):
+        return web.json_response(self.region_status())
+
+    async def _http_shm_register(self, request):
+        body = await request.json()
+        try:
+            self.register_region(
+                request.match_info['region'], body['key'], body.get('offset', 0), body['byte_size']
+            )
+        except (ValueError, FileNotFoundError) as e:
+            return web.json_response({'error': str(e)}, status=400)
+        return web.Response()
+
+    async def _http_shm_unregister(self, request):
+        self.unregister_region(request.match_info.get('region', ''))
+        return web.Response()
+
+    async def _http_infer(self, request):
+        body = await request.read()
+        header_length = request.headers.get('Inference-Header-Content-Length')
+        header = json.loads(body[:int(header_length)] if header_length else body)
+        model_name = request.match_info['model']
+        input_parameters = header['inputs'][0].get('parameters', {})
+        if 'shared_memory_region' in input_parameters:
+            self.read_input(input_parameters)
+        output_name, shape, data = await self.infer(
+            model_name, header['inputs'][0]['shape'][0], header.get('parameters', {}).get('timeout')
+        )
+        output = {'name': output_name, 'datatype': 'FP32', 'shape': shape}
+        output_parameters = next(
+            (requested.get('parameters', {}) for requested in header.get('outputs', [])
+             if requested['name'] == output_name), {}
+        )
+        if 'shared_memory_region' in output_parameters:
+            self.write_output(output_parameters, data)
+            output['parameters'] = output_parameters
+            data = b''
+        else:
+            output['parameters'] = {'binary_data_size': len(data)}
+        response = {'model_name': model_name, 'model_version': '1', 'outputs': [output]}
+        if header.get('id'):
+            response['id'] = header['id']
+        response_header = json.dumps(response).encode()
+        return web.Response(
+            body=response_header + data,
+            headers={'Inference-Header-Content-Length': str(len(response_header))},
+            content_type='application/octet-stream'
+        )
+
+    async def serve_http(self, port):
+        runner = web.AppRunner(self.http_app())
+        await runner.setup()
+        await web.TCPSite(runner, 'localhost', port).start()
+        return runner
+
+    # --- gRPC ---
+
+    async def serve_grpc(self, port):
+        server = grpc.aio.server(options=[
+            ('grpc.max_send_message_length', -1),
+            ('grpc.max_receive_message_length', -1)
+        ])
+        service_pb2_grpc.add_GRPCInferenceServiceServicer_to_server(_GrpcService(self), server)
+        server.add_insecure_port(f"localhost:{port}")
+        await server.start()
+        return server
+
+
+class _GrpcService(service_pb2_grpc.GRPCInferenceServiceServicer):
+    def __init__(self, triton):
+        self.triton = triton
+
+    async def ServerLive(self, request, context):
+        return service_pb2.ServerLiveResponse(live=True)
+
+    async def ServerReady(self, request, context):
+        return service_pb2.ServerReadyResponse(ready=True)
+
+    async def ModelMetadata(self, request, context):
+        metadata = model_metadata(request.name)
+        return service_pb2.ModelMetadataResponse(
+            name=metadata['name'],
+            versions=metadata['versions'],
+            platform=metadata['platform'],
+            inputs=[service_pb2.ModelMetadataResponse.TensorMetadata(**tensor) for tensor in metadata['inputs']],
+            outputs=[service_pb2.ModelMetadataResponse.TensorMetadata(**tensor) for tensor in metadata['outputs']]
+        )
+
+    async def ModelConfig(self, request, context):
+        return service_pb2.ModelConfigResponse(
+            config=model_config_pb2.ModelConfig(name=request.name, max_batch_size=MAX_BATCH_SIZE)
+        )
+
+    async def RepositoryIndex(self, request, context):
+        return service_pb2.RepositoryIndexResponse(models=[
+            service_pb2.RepositoryIndexResponse.ModelIndex(name=name, version='1', state='READY')
+            for name in MODELS
+        ])
+
+    async def ModelStatistics(self, request, context):
+        return service_pb2.ModelStatisticsResponse()
+
+    async def SystemSharedMemoryRegister(self, request, context):
+        try:
+            self.triton.register_region(request.name, request.key, request.offset, request.byte_size)
+        except (ValueError, FileNotFoundError) as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        return service_pb2.SystemSharedMemoryRegisterResponse()
+
+    async def SystemSharedMemoryUnregister(self, request, context):
+        self.triton.unregister_region(request.name)
+        return service_pb2.SystemSharedMemoryUnregisterResponse()
+
+    async def SystemSharedMemoryStatus(self, request, context):
+        return service_pb2.SystemSharedMemoryStatusResponse(regions={
+            region['name']: service_pb2.SystemSharedMemoryStatusResponse.RegionStatus(**region)
+            for region in self.triton.region_status()
+        })
+
+    async def ModelInfer(self, request, context):
+        return await self._infer(request)
+
+    async def ModelStreamInfer(self, request_iterator, context):
+        async for request in request_iterator:
+            yield service_pb2.ModelStreamInferResponse(infer_response=await self._infer(request))
+
+    async def _infer(self, request):
+        input_parameters = _parameters(request.inputs[0].parameters)
+        if 'shared_memory_region' in input_parameters:
+            self.triton.read_input(input_parameters)
+        timeout = _parameters(request.parameters).get('timeout')
+        output_name, shape, data = await self.triton.infer(request.model_name, request.inputs[0].shape[0], timeout)
+        response = service_pb2.ModelInferResponse(model_name=request.model_name, model_version='1', id=request.id)
+        output = response.outputs.add(name=output_name, datatype='FP32', shape=shape)
+        requested = next((output for output in request.outputs if output.name == output_name), None)
+        if requested is not None and 'shared_memory_region' in requested.parameters:
+            self.triton.write_output(_parameters(requested.parameters), data)
+            for key, value in requested.parameters.items():
+                output.parameters[key].CopyFrom(value)
+        else:
+            response.raw_output_contents.append(data)
+        return response
+
+
+def _parameters(parameters):
+    """InferParameter map -> plain dict."""
+    return {key: getattr(value, value.WhichOneof('parameter_choice')) for key, value in parameters.items()}
+
+
+async def serve(http_port, grpc_port, delay=0.0, ready=None):
+    triton = FakeTriton(delay)
+    runner = await triton.serve_http(http_port)
+    server = await triton.serve_grpc(grpc_port)
+    print(f"Fake Triton serving HTTP on {http_port} and gRPC on {grpc_port}")
+    if ready is not None:
+        ready.set()
+    try:
+        await asyncio.Future()
+    finally:
+        await server.stop(None)
+        await runner.cleanup()
+
+
+def run(http_port, grpc_port, delay=0.0, ready=None):
+    asyncio.run(serve(http_port, grpc_port, delay, ready))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--http-port', type=int, default=8000)
+    parser.add_argument('--grpc-port', type=int, default=8001)
+    parser.add_argument('--delay-ms', type=float, default=0.0)
+    args = parser.parse_args()
+    run(args.http_port, args.grpc_port, args.delay_ms / 1000.0)
+
+
+if __name__ == '__main__':
+    main()
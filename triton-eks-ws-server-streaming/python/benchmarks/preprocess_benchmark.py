@@ -0,0 +1,118 @@
+"""Time and allocations of the uint8 HWC -> float32 NCHW preprocessing step.
+
+Compares the fused preprocessing.Normalization kernel with:
+
+  * the server's original numpy chain (np.array, transpose, expand_dims,
+    astype, / 255.0) on a decoded 224x224 image, and
+  * Python-Client's original torchvision Resize(256) + CenterCrop(224) +
+    ToTensor() + Normalize() + .numpy() on a decoded 1024x768 image
+    (skipped when torchvision is not installed).
+
+Decoding is left out; see decode_benchmark.py for that.
+
+    python3 benchmarks/preprocess_benchmark.py [--repeat 2000]
+"""
+import argparse
+import statistics
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocessing import DEFAULT_NORMALIZATION, IMAGENET_NORMALIZATION, resize_center_crop
+
+
+def random_image(width, height):
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+
+
+def server_original(image):
+    image_array = np.array(image)
+    image_array = np.transpose(image_array, (2, 0, 1))
+    image_array = np.expand_dims(image_array, axis=0).astype(np.float32)
+    return image_array / 255.0
+
+
+def client_original():
+    try:
+        import torchvision.transforms as transforms
+    except ImportError:
+        return None
+    preprocess = transforms.Compose([
+        transforms.Resize(256),
+        transforms.CenterCrop(224),
+        transforms.ToTensor(),
+        transforms.Normalize(
+            mean=[0.485, 0.456, 0.406],
+            std=[0.229, 0.224, 0.225]
+        )
+    ])
+    return lambda image: preprocess(image).numpy()[None, ...]
+
+
+def measure(fn, image, repeat):
+    """Median and p99 time per call, and peak bytes allocated by one call."""
+    fn(image)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(image)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn(image)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99)], peak
+
+
+def report(label, fn, image, repeat, reference=None):
+    median, p99, peak = measure(fn, image, repeat)
+    line = f"{label:<34} {median * 1e6:>10.1f} {p99 * 1e6:>9.1f} {peak / 1024:>12.1f}"
+    if reference is not None:
+        line += f"   max |diff| vs original {np.abs(fn(image) - reference).max():.2e}"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'path':<34} {'median us':>10} {'p99 us':>9} {'alloc KB':>12}")
+
+    # Server: decoded 224x224 image -> [0, 1] input
+    image = random_image(224, 224)
+    out = np.empty((1, 3, 224, 224), dtype=np.float32)
+    batch = np.empty((8, 3, 224, 224), dtype=np.float32)
+    reference = server_original(image)
+    report('server original', server_original, image, args.repeat)
+    report('server fused', lambda image: DEFAULT_NORMALIZATION.apply(image, out)[None],
+           image, args.repeat, reference)
+    report('server fused, batch slot', lambda image: DEFAULT_NORMALIZATION.apply(image, batch[3])[None],
+           image, args.repeat, reference)
+
+    # Client: decoded 1024x768 image -> resized, cropped, ImageNet-normalized input
+    image = random_image(1024, 768)
+
+    def client_fused(image):
+        IMAGENET_NORMALIZATION.apply(resize_center_crop(image, 256, 224), out)
+        return out
+
+    original = client_original()
+    if original is None:
+        print('client original                    skipped: torchvision is not installed')
+        report('client fused', client_fused, image, args.repeat // 10)
+    else:
+        report('client original', original, image, args.repeat // 10)
+        report('client fused', client_fused, image, args.repeat // 10, original(image))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Throughput and latency of each Triton transport against a local fake Triton.
+
+Starts benchmarks/fake_triton.py in a child process, then for every
+transport in triton_transport.TRANSPORTS sends the same workload: `--requests`
+inferences of one 1x3x224x224 FP32 image (or `--batch` images), alternating
+between the server's default models, `--concurrency` at a time. Reports
+requests per second and p50/p99 latency per transport.
+
+The fake answers with zeros after `--delay-ms`, so the numbers compare
+client and wire overhead, not model speed; run against a real Triton with
+--triton-http/--triton-grpc to include it. --shared-memory adds a run of
+each transport with tensors in system shared memory (Triton on this host).
+
+    python3 benchmarks/transport_benchmark.py [--requests 2000] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import sys
+import time
+from contextlib import closing
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared_memory_pool import SharedMemoryPool
+from triton_transport import TRANSPORTS, create_transport
+import fake_triton
+
+
+def free_port():
+    with closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as s:
+        s.bind(('', 0))
+        return s.getsockname()[1]
+
+
+def start_fake_triton(delay):
+    http_port, grpc_port = free_port(), free_port()
+    context = multiprocessing.get_context('spawn')
+    ready = context.Event()
+    process = context.Process(
+        target=fake_triton.run,
+        args=(http_port, grpc_port, delay, ready),
+        daemon=True
+    )
+    process.start()
+    if not ready.wait(30):
+        process.kill()
+        raise RuntimeError("Fake Triton did not start")
+    return process, f"localhost:{http_port}", f"localhost:{grpc_port}"
+
+
+async def run_workload(transport, requests, concurrency, batch):
+    input_data = np.random.default_rng(0).random((batch,) + tuple(fake_triton.INPUT_SHAPE), dtype=np.float32)
+    models = [
+        (model_name, input_name, fake_triton.model_metadata(model_name)['outputs'])
+        for model_name, (input_name, _, _) in fake_triton.MODELS.items()
+    ]
+
+    async def infer(i):
+        model_name, input_name, outputs = models[i % len(models)]
+        start = time.perf_counter()
+        await transport.infer(model_name, input_name, input_data, 'FP32', request_id=str(i), outputs=outputs)
+        return time.perf_counter() - start
+
+    # Open connections and warm up outside the measured region
+    await asyncio.gather(*(infer(i) for i in range(concurrency)))
+
+    latencies = []
+    next_request = iter(range(requests))
+
+    async def worker():
+        for i in next_request:
+            latencies.append(await infer(i))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return elapsed, np.array(latencies)
+
+
+async def benchmark(name, url, args, shared_memory=False):
+    transport = create_transport(
+        name, url, conn_limit=args.concurrency, streams=args.streams,
+        shared_memory=SharedMemoryPool(regions=args.concurrency) if shared_memory else None
+    )
+    await transport.start()
+    try:
+        return await run_workload(transport, args.requests, args.concurrency, args.batch)
+    finally:
+        await transport.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--batch', type=int, default=1)
+    parser.add_argument('--streams', type=int, default=1, help='Streams for grpc_stream')
+    parser.add_argument('--shared-memory', action='store_true',
+                        help='Also run each transport with tensors in system shared memory')
+    parser.add_argument('--delay-ms', type=float, default=0.0,
+                        help='Simulated inference time in the fake Triton')
+    parser.add_argument('--transports', nargs='+', default=list(TRANSPORTS), choices=list(TRANSPORTS))
+    parser.add_argument('--triton-http', help='Use this Triton HTTP endpoint instead of the fake')
+    parser.add_argument('--triton-grpc', help='Use this Triton gRPC endpoint instead of the fake')
+    args = parser.parse_args()
+
+    process = None
+    if args.triton_http and args.triton_grpc:
+        http_url, grpc_url = args.triton_http, args.triton_grpc
+    else:
+        process, http_url, grpc_url = start_fake_triton(args.delay_ms / 1000.0)
+        http_url, grpc_url = args.triton_http or http_url, args.triton_grpc or grpc_url
+    try:
+        print(f"{args.requests} requests of batch {args.batch}, concurrency {args.concurrency}")
+        print(f"{'transport':<16} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        runs = [(name, False) for name in args.transports]
+        if args.shared_memory:
+            runs += [(name, True) for name in args.transports]
+        for name, shared_memory in runs:
+            url = grpc_url if TRANSPORTS[name].protocol == 'grpc' else http_url
+            elapsed, latencies = asyncio.run(benchmark(name, url, args, shared_memory))
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+            label = f"{name}+shm" if shared_memory else name
+            print(f"{label:<16} {len(latencies) / elapsed:>9.0f} {p50:>8.2f} {p99:>8.2f} "
+                  f"{latencies.max() * 1000:>8.2f}")
+    finally:
+        if process is not None:
+            process.kill()
+            process.join()
+
+
+if __name__ == '__main__':
+    main()
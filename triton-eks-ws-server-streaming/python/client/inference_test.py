@@ -24,10 +24,12 @@ async def test_inference():
             close_timeout=20,
             max_size=None
         ) as ws:
-            # Prepare request
+            # Prepare request. The server drops the work once our 30 s
+            # response timeout below has passed.
             request = {
                 "bucket": bucket,
-                "key": test_image
+                "key": test_image,
+                "deadline_ms": 30000
             }
             
             logger.info("WebSocket connected. Sending request...")
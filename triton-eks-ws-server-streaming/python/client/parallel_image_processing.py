@@ -2,7 +2,7 @@ import asyncio
 import websockets
 import json
 import boto3
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import numpy as np
 from datetime import datetime
 import sys
@@ -11,8 +11,16 @@ import csv
 from asyncio import Semaphore
 from contextlib import asynccontextmanager
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from tensor_frames import BINARY_SUBPROTOCOL, decode_tensor_frame
+
+# Server trace stages written to the results CSV, as <stage>_ms columns
+TRACE_STAGES = ['s3_get', 'decode', 'preprocess', 'metadata', 'infer_densenet', 'infer_resnet', 'serialize']
+
 class BatchInferenceClient:
-    def __init__(self, uri: str, bucket: str, max_concurrent: int = 5):
+    def __init__(self, uri: str, bucket: str, max_concurrent: int = 5, binary_responses: bool = True,
+                 top_k: Optional[int] = None, max_retries: int = 3, deadline_ms: Optional[int] = None,
+                 trace: bool = False):
         self.uri = uri
         self.bucket = bucket
         self.s3_client = boto3.client('s3')
@@ -20,6 +28,18 @@ class BatchInferenceClient:
         self.results_dir.mkdir(exist_ok=True)
         self.max_concurrent = max_concurrent
         self.semaphore = Semaphore(max_concurrent)
+        # Ask the server for binary tensor frames instead of JSON lists
+        self.subprotocols = [BINARY_SUBPROTOCOL] if binary_responses else None
+        # Have the server return only the top_k softmax probabilities per
+        # output; None requests the full vectors (needed for statistics)
+        self.top_k = top_k
+        # Times to retry a request the server shed as overloaded
+        self.max_retries = max_retries
+        # Per-request time budget sent to the server, which skips work that
+        # can no longer finish in time
+        self.deadline_ms = deadline_ms
+        # Ask the server for a per-stage timing breakdown of every request
+        self.trace = trace
         
     def list_s3_images(self, prefix: str = "images/") -> List[str]:
         """List all images in the S3 bucket with given prefix."""
@@ -35,7 +55,7 @@ class BatchInferenceClient:
     async def get_websocket(self):
         """Context manager for websocket connections with semaphore control."""
         async with self.semaphore:
-            async with websockets.connect(self.uri) as websocket:
+            async with websockets.connect(self.uri, subprotocols=self.subprotocols) as websocket:
                 yield websocket
 
     async def process_single_image(self, image_key: str) -> Dict[str, Any]:
@@ -47,18 +67,34 @@ class BatchInferenceClient:
                     "bucket": self.bucket,
                     "key": image_key
                 }
+                if self.top_k:
+                    request.update({"top_k": self.top_k, "softmax": True})
+                if self.deadline_ms:
+                    request["deadline_ms"] = self.deadline_ms
+                if self.trace:
+                    request["trace"] = True
                 
                 print(f"\nProcessing image: {image_key}")
-                await websocket.send(json.dumps(request))
-                response = await websocket.recv()
-                result = json.loads(response)
+                for attempt in range(self.max_retries + 1):
+                    await websocket.send(json.dumps(request))
+                    response = await websocket.recv()
+                    if isinstance(response, bytes):
+                        result = decode_tensor_frame(response)
+                    else:
+                        result = json.loads(response)
+                    if result.get('status') != 'overloaded' or attempt == self.max_retries:
+                        break
+                    retry_after = result.get('retry_after_ms', 100) / 1000.0
+                    print(f"Server overloaded, retrying {image_key} in {retry_after:.2f}s")
+                    await asyncio.sleep(retry_after)
                 
                 processing_time = (datetime.now() - start_time).total_seconds()
                 
                 image_result = {
                     'image_key': image_key,
                     'status': result.get('status', 'error'),
-                    'processing_time': processing_time
+                    'processing_time': processing_time,
+                    'trace': result.get('trace')
                 }
                 
                 if result.get('status') == 'success':
@@ -99,7 +135,20 @@ class BatchInferenceClient:
         results = {}
         
         for output_name, output_data in model_outputs.items():
-            output_array = np.array(output_data)
+            if isinstance(output_data, dict):
+                # Already reduced by the server to top-k softmax probabilities
+                results[output_name] = {
+                    'top_predictions': [{
+                        'class_id': int(class_id),
+                        'confidence': float(confidence)
+                    } for class_id, confidence in zip(
+                        np.asarray(output_data['class_ids'])[0],
+                        np.asarray(output_data['scores'])[0]
+                    )]
+                }
+                continue
+
+            output_array = np.asarray(output_data)
             
             # Reshape if needed (for DenseNet)
             if len(output_array.shape) > 2:
@@ -141,7 +190,8 @@ class BatchInferenceClient:
         """Save batch processing results to CSV file."""
         csv_path = self.results_dir / f'inference_results_{timestamp}.csv'
         fieldnames = ['image_key', 'status', 'densenet_top1_class', 'densenet_top1_confidence', 
-                     'resnet_top1_class', 'resnet_top1_confidence', 'processing_time']
+                     'resnet_top1_class', 'resnet_top1_confidence', 'processing_time',
+                     'server_total_ms', *[f'{stage}_ms' for stage in TRACE_STAGES], 'trace_id']
         
         with open(csv_path, 'w', newline='') as csvfile:
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
@@ -165,6 +215,12 @@ class BatchInferenceClient:
                         row['resnet_top1_confidence'] = top_resnet.get('confidence', '')
                 
                 row['processing_time'] = result.get('processing_time', '')
+                trace = result.get('trace')
+                if trace:
+                    row['trace_id'] = trace.get('trace_id', '')
+                    row['server_total_ms'] = trace.get('total_ms', '')
+                    for stage in TRACE_STAGES:
+                        row[f'{stage}_ms'] = trace.get('stages_ms', {}).get(stage, '')
                 writer.writerow(row)
         
         print(f"\nResults saved to: {csv_path}")
@@ -10,12 +10,16 @@ import csv
 import boto3
 from PIL import Image
 import io
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from tqdm import tqdm
 import concurrent.futures
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from tensor_frames import BINARY_SUBPROTOCOL, decode_tensor_frame, image_frame_fragments
+
 class ParallelVideoProcessor:
-    def __init__(self, uri: str, bucket: str, max_concurrent_videos: int = 2, max_concurrent_frames: int = 3):
+    def __init__(self, uri: str, bucket: str, max_concurrent_videos: int = 2, max_concurrent_frames: int = 3,
+                 binary_responses: bool = True, top_k: Optional[int] = None, max_retries: int = 3):
         self.uri = uri
         self.bucket = bucket
         self.s3_client = boto3.client('s3')
@@ -23,6 +27,12 @@ class ParallelVideoProcessor:
         self.results_dir.mkdir(exist_ok=True)
         self.max_concurrent_videos = max_concurrent_videos
         self.max_concurrent_frames = max_concurrent_frames
+        # Ask the server for binary tensor frames instead of JSON lists
+        self.subprotocols = [BINARY_SUBPROTOCOL] if binary_responses else None
+        # Have the server return only the top_k softmax probabilities per output
+        self.top_k = top_k
+        # Times to retry a frame the server shed as overloaded
+        self.max_retries = max_retries
 
     def list_s3_videos(self, prefix: str = "videos/") -> List[str]:
         """List all videos in the S3 bucket with given prefix."""
@@ -45,26 +55,50 @@ class ParallelVideoProcessor:
             print(f"Error downloading video: {e}")
             raise
 
-    async def process_frame(self, websocket, frame, frame_number: int):
+    async def receive_responses(self, websocket, pending: Dict[str, asyncio.Future]):
+        """Route responses on a shared connection to the frame waiting for them."""
+        try:
+            async for response in websocket:
+                if isinstance(response, bytes):
+                    result = decode_tensor_frame(response)
+                else:
+                    result = json.loads(response)
+                future = pending.pop(result.get('request_id'), None)
+                if future is not None and not future.done():
+                    future.set_result(result)
+        finally:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("WebSocket closed before response"))
+
+    async def process_frame(self, websocket, pending: Dict[str, asyncio.Future], frame, frame_number: int):
         """Process a single frame through the models."""
         try:
-            frame_path = self.results_dir / f"temp_frame_{frame_number}.jpg"
-            cv2.imwrite(str(frame_path), frame)
-            
-            frame_s3_key = f"temp_frames/frame_{frame_number}.jpg"
-            self.s3_client.upload_file(str(frame_path), self.bucket, frame_s3_key)
+            # The frame goes to the server inline as JPEG bytes in a binary
+            # request, instead of through a temp file and S3 object
+            encoded, jpeg = cv2.imencode('.jpg', frame)
+            if not encoded:
+                raise ValueError(f"Could not encode frame {frame_number} as JPEG")
             
-            request = {
-                "bucket": self.bucket,
-                "key": frame_s3_key
-            }
+            # Several frames share the connection and the server may answer
+            # out of order, so responses are matched back by request_id
+            request_id = f"frame-{frame_number}"
+            request = {"request_id": request_id}
+            if self.top_k:
+                request.update({"top_k": self.top_k, "softmax": True})
             
-            await websocket.send(json.dumps(request))
-            response = await websocket.recv()
-            result = json.loads(response)
-            
-            frame_path.unlink()
-            self.s3_client.delete_object(Bucket=self.bucket, Key=frame_s3_key)
+            for attempt in range(self.max_retries + 1):
+                future = asyncio.get_running_loop().create_future()
+                pending[request_id] = future
+                # Sent as one fragmented message, so a large frame never
+                # has to fit in a single WebSocket frame
+                await websocket.send(image_frame_fragments(request, jpeg))
+                result = await future
+                if result.get('status') != 'overloaded' or attempt == self.max_retries:
+                    break
+                retry_after = result.get('retry_after_ms', 100) / 1000.0
+                print(f"Server overloaded, retrying frame {frame_number} in {retry_after:.2f}s")
+                await asyncio.sleep(retry_after)
             
             return result
             
@@ -78,7 +112,20 @@ class ParallelVideoProcessor:
         results = {}
         
         for output_name, output_data in model_outputs.items():
-            output_array = np.array(output_data)
+            if isinstance(output_data, dict):
+                # Already reduced by the server to top-k softmax probabilities
+                results[output_name] = {
+                    'top_predictions': [{
+                        'class_id': int(class_id),
+                        'confidence': float(confidence)
+                    } for class_id, confidence in zip(
+                        np.asarray(output_data['class_ids'])[0],
+                        np.asarray(output_data['scores'])[0]
+                    )]
+                }
+                continue
+
+            output_array = np.asarray(output_data)
             
             if len(output_array.shape) > 2:
                 output_array = output_array.reshape(output_array.shape[0], -1)
@@ -144,10 +191,13 @@ class ParallelVideoProcessor:
                     break
                 
                 # Process frames in parallel
-                async with websockets.connect(self.uri) as websocket:
-                    tasks = [self.process_frame(websocket, frame, num) 
+                async with websockets.connect(self.uri, subprotocols=self.subprotocols) as websocket:
+                    pending = {}
+                    receiver = asyncio.create_task(self.receive_responses(websocket, pending))
+                    tasks = [self.process_frame(websocket, pending, frame, num) 
                             for frame, num in zip(frame_batch, frame_numbers)]
                     batch_results = await asyncio.gather(*tasks)
+                    receiver.cancel()
                     
                     for num, result in zip(frame_numbers, batch_results):
                         frame_result = {
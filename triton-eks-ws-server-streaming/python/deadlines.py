@@ -0,0 +1,26 @@
+import time
+
+
+class DeadlineExceeded(Exception):
+    """A request's deadline passed before its work could be done."""
+
+
+def deadline_after(deadline_ms):
+    """Monotonic deadline `deadline_ms` from now, or None for no deadline."""
+    if deadline_ms is None:
+        return None
+    return time.monotonic() + deadline_ms / 1000.0
+
+
+def remaining(deadline, stage):
+    """Seconds left before `deadline` (None if there is none).
+
+    Raises DeadlineExceeded when the deadline has already passed, so the
+    caller skips `stage` instead of starting work nobody is waiting for.
+    """
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded(f"Deadline exceeded before {stage}")
+    return left
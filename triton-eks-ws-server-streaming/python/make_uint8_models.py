@@ -0,0 +1,172 @@
+"""Generate Triton ensembles that take UINT8 pixels instead of FP32 tensors.
+
+For each source model (densenet_onnx and resnet50_onnx by default) this
+writes two entries to a local model repository directory:
+
+    <model>_normalize   ONNX model: Cast(uint8 -> float) * gain + bias
+    <model>_uint8       ensemble: <model>_normalize -> <model>
+
+The ensemble has the source model's outputs, so responses are unchanged,
+but the WebSocket server sends it 1 byte per pixel value instead of 4.
+Input names, shapes and outputs are read from the running Triton server;
+normalization uses the same {'scale', 'mean', 'std'} settings as the
+server's `preprocessing` option (pixels scaled to [0, 1] by default).
+
+    python3 make_uint8_models.py --triton-url localhost:8000 --output models/
+    aws s3 cp models/ s3://dry-bean-bucket-c/models/ --recursive
+
+Point the server's `models` at the <model>_uint8 entries; it picks UINT8
+transport from their input datatype. Requires the `onnx` package.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import tritonclient.http as httpclient
+
+from preprocessing import DEFAULT_NORMALIZATION, Normalization
+
+NORMALIZED_TENSOR = 'normalized'
+PIXELS_TENSOR = 'pixels'
+
+
+def config_datatype(datatype):
+    """Metadata datatype ('FP32') -> model config data type ('TYPE_FP32')."""
+    return 'TYPE_STRING' if datatype == 'BYTES' else f"TYPE_{datatype}"
+
+
+def tensor_dims(shape, max_batch_size):
+    # With batching enabled the batch dimension is implicit in the config
+    return list(shape[1:]) if max_batch_size > 0 else list(shape)
+
+
+def format_tensors(field, tensors):
+    entries = ',\n'.join(
+        f'  {{\n    name: "{name}"\n    data_type: {data_type}\n    dims: {json.dumps(dims)}\n  }}'
+        for name, data_type, dims in tensors
+    )
+    return f"{field} [\n{entries}\n]\n"
+
+
+def build_normalize_onnx(normalization, dims, max_batch_size):
+    """ONNX graph mapping UINT8 pixels to normalized FP32 for one model input."""
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    shape = (['batch'] if max_batch_size > 0 else []) + list(dims)
+    channel_shape = [len(normalization.gain), 1, 1]
+    gain = numpy_helper.from_array(
+        np.array(normalization.gain, dtype=np.float32).reshape(channel_shape), 'gain'
+    )
+    bias = numpy_helper.from_array(
+        np.array(normalization.bias, dtype=np.float32).reshape(channel_shape), 'bias'
+    )
+    graph = helper.make_graph(
+        [
+            helper.make_node('Cast', [PIXELS_TENSOR], ['pixels_fp32'], to=TensorProto.FLOAT),
+            helper.make_node('Mul', ['pixels_fp32', 'gain'], ['scaled']),
+            helper.make_node('Add', ['scaled', 'bias'], [NORMALIZED_TENSOR])
+        ],
+        'normalize',
+        [helper.make_tensor_value_info(PIXELS_TENSOR, TensorProto.UINT8, shape)],
+        [helper.make_tensor_value_info(NORMALIZED_TENSOR, TensorProto.FLOAT, shape)],
+        initializer=[gain, bias]
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    # Older Triton onnxruntime backends reject the newest IR versions
+    model.ir_version = 8
+    onnx.checker.check_model(model)
+    return model.SerializeToString()
+
+
+def write_model(output_dir, name, config, files=None):
+    version_dir = os.path.join(output_dir, name, '1')
+    os.makedirs(version_dir, exist_ok=True)
+    with open(os.path.join(output_dir, name, 'config.pbtxt'), 'w') as f:
+        f.write(config)
+    for file_name, data in (files or {}).items():
+        with open(os.path.join(version_dir, file_name), 'wb') as f:
+            f.write(data)
+    print(f"Wrote {os.path.join(output_dir, name)}")
+
+
+def generate(client, model_name, normalization, output_dir):
+    metadata = client.get_model_metadata(model_name)
+    config = client.get_model_config(model_name)
+    max_batch_size = int(config.get('max_batch_size', 0))
+    model_input = metadata['inputs'][0]
+    if model_input['datatype'] != 'FP32':
+        raise ValueError(f"{model_name} input is {model_input['datatype']}, expected FP32")
+    dims = tensor_dims(model_input['shape'], max_batch_size)
+
+    normalize_name = f"{model_name}_normalize"
+    write_model(
+        output_dir,
+        normalize_name,
+        f'name: "{normalize_name}"\n'
+        f'platform: "onnxruntime_onnx"\n'
+        f'max_batch_size: {max_batch_size}\n'
+        + format_tensors('input', [(PIXELS_TENSOR, 'TYPE_UINT8', dims)])
+        + format_tensors('output', [(NORMALIZED_TENSOR, 'TYPE_FP32', dims)]),
+        {'model.onnx': build_normalize_onnx(normalization, dims, max_batch_size)}
+    )
+
+    outputs = [
+        (output['name'], config_datatype(output['datatype']), tensor_dims(output['shape'], max_batch_size))
+        for output in metadata['outputs']
+    ]
+    output_map = ''.join(
+        f'      output_map {{ key: "{name}" value: "{name}" }}\n' for name, _, _ in outputs
+    )
+    ensemble_name = f"{model_name}_uint8"
+    write_model(
+        output_dir,
+        ensemble_name,
+        f'name: "{ensemble_name}"\n'
+        f'platform: "ensemble"\n'
+        f'max_batch_size: {max_batch_size}\n'
+        + format_tensors('input', [(PIXELS_TENSOR, 'TYPE_UINT8', dims)])
+        + format_tensors('output', outputs)
+        + 'ensemble_scheduling {\n'
+        '  step [\n'
+        '    {\n'
+        f'      model_name: "{normalize_name}"\n'
+        '      model_version: -1\n'
+        f'      input_map {{ key: "{PIXELS_TENSOR}" value: "{PIXELS_TENSOR}" }}\n'
+        f'      output_map {{ key: "{NORMALIZED_TENSOR}" value: "{NORMALIZED_TENSOR}" }}\n'
+        '    },\n'
+        '    {\n'
+        f'      model_name: "{model_name}"\n'
+        '      model_version: -1\n'
+        f'      input_map {{ key: "{model_input["name"]}" value: "{NORMALIZED_TENSOR}" }}\n'
+        + output_map
+        + '    }\n'
+        '  ]\n'
+        '}\n'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--triton-url', default='localhost:8000')
+    parser.add_argument('--output', default='models')
+    parser.add_argument('--models', nargs='+', default=['densenet_onnx', 'resnet50_onnx'])
+    parser.add_argument(
+        '--preprocessing',
+        type=json.loads,
+        default={},
+        help='JSON {model name: {"scale", "mean", "std"}}, as the server option'
+    )
+    args = parser.parse_args()
+
+    client = httpclient.InferenceServerClient(url=args.triton_url)
+    for model_name in args.models:
+        normalization = Normalization.from_config(
+            args.preprocessing.get(model_name, DEFAULT_NORMALIZATION)
+        )
+        generate(client, model_name, normalization, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Prometheus metrics for the WebSocket pipeline server.
+
+Instruments live at module level, as prometheus_client expects, and are
+updated from the request path. start_metrics_server() serves them over HTTP
+on their own port, next to the WebSocket port.
+
+When server_launcher.py runs several server processes, each one writes its
+samples to PROMETHEUS_MULTIPROC_DIR and the supervisor serves the sum with
+start_multiprocess_metrics_server(). The directory must be set before
+prometheus_client is imported, so it is inherited from the supervisor.
+"""
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess, start_http_server
+
+# Roughly 1 ms to 30 s
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.5,
+    0.75, 1.0, 1.5, 2.5, 5.0, 10.0, 30.0
+)
+# 256 B to 64 MB
+SIZE_BUCKETS = tuple(256 * 4 ** i for i in range(10))
+
+STAGE_SECONDS = Histogram(
+    'ws_pipeline_stage_seconds',
+    'Time spent in each pipeline stage',
+    ['stage', 'model'],
+    buckets=LATENCY_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    'ws_pipeline_request_seconds',
+    'End-to-end time from receiving a request to sending its reply',
+    ['status'],
+    buckets=LATENCY_BUCKETS
+)
+REQUESTS = Counter(
+    'ws_pipeline_requests_total',
+    'Requests handled, by reply status',
+    ['status']
+)
+MESSAGE_BYTES = Histogram(
+    'ws_pipeline_message_bytes',
+    'Size of WebSocket messages received and sent, and of S3 objects fetched',
+    ['direction'],
+    buckets=SIZE_BUCKETS
+)
+CACHE_LOOKUPS = Counter(
+    'ws_pipeline_cache_lookups_total',
+    'Tensor and result cache lookups, by outcome',
+    ['cache', 'result']
+)
+COALESCED_REQUESTS = Counter(
+    'ws_pipeline_coalesced_requests_total',
+    'Requests that shared an in-flight run for the same S3 object'
+)
+INFLIGHT_REQUESTS = Gauge(
+    'ws_pipeline_inflight_requests',
+    'Requests admitted and running',
+    multiprocess_mode='livesum'
+)
+QUEUED_REQUESTS = Gauge(
+    'ws_pipeline_queued_requests',
+    'Requests waiting for admission',
+    multiprocess_mode='livesum'
+)
+OPEN_CONNECTIONS = Gauge(
+    'ws_pipeline_open_connections',
+    'Open WebSocket connections',
+    multiprocess_mode='livesum'
+)
+TRITON_QUEUE_SECONDS = Gauge(
+    'ws_pipeline_triton_queue_seconds',
+    "Triton's average queue time over the last poll (worst model)",
+    multiprocess_mode='livemax'
+)
+
+
+def start_metrics_server(port):
+    """Serve /metrics on `port` from a background thread."""
+    start_http_server(port)
+    print(f"Metrics server started on http://localhost:{port}/metrics")
+
+
+def start_multiprocess_metrics_server(port):
+    """Serve /metrics on `port`, aggregated over every worker process."""
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    start_http_server(port, registry=registry)
+    print(f"Aggregated metrics server started on http://localhost:{port}/metrics")
+
+
+def mark_worker_dead(pid):
+    """Drop a dead worker's live gauges; its counters stay in the totals."""
+    multiprocess.mark_process_dead(pid)
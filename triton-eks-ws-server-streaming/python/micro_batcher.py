@@ -0,0 +1,129 @@
+import asyncio
+import contextvars
+import time
+from collections import deque
+
+import numpy as np
+
+from deadlines import DeadlineExceeded, remaining
+
+
+class MicroBatcher:
+    """Collects single-request tensors into batched inference calls.
+
+    Tensors submitted from any connection are queued until either
+    `max_batch_size` rows are waiting or `max_delay` seconds have passed since
+    the first one arrived. The queue is then concatenated along the batch
+    dimension, sent through `infer_batch` as one request, and each caller gets
+    back its own rows of every output.
+
+    `infer_batch` is a coroutine function taking the batched input array,
+    the batch's deadline (the latest of its requests', or None if any has
+    none) and its requests' IDs joined with commas (or None), returning
+    {output_name: ndarray} with the batch dimension first.
+    Requests whose deadline has passed by the time their batch is sent are
+    failed with DeadlineExceeded and left out of it.
+    """
+
+    def __init__(self, name, infer_batch, max_batch_size, max_delay=0.005):
+        self.name = name
+        self.infer_batch = infer_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_delay = max_delay
+        self._queue = deque()
+        self._queued_rows = 0
+        self._timer = None
+        # Running batches, kept referenced until they finish
+        self._tasks = set()
+        self.batches = 0
+        self.rows = 0
+
+    async def submit(self, input_data, deadline=None, request_id=None):
+        """Queue an input ([n, ...]) and wait for its rows of the outputs.
+
+        The wait ends at `deadline` even if the batch, which may carry
+        requests without one, is still running.
+        """
+        timeout = remaining(deadline, f"{self.name} inference")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((input_data, future, deadline, request_id))
+        self._queued_rows += input_data.shape[0]
+
+        if self._queued_rows >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush)
+        try:
+            # A timed-out future is cancelled, so the batch skips it
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            if deadline is None:
+                # The batch's own error, set on the future
+                raise
+            raise DeadlineExceeded(f"Deadline exceeded waiting for {self.name} batch")
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._queue:
+            # Take whole requests until the next one would overflow the batch
+            batch = []
+            rows = 0
+            while self._queue and (not batch or rows + self._queue[0][0].shape[0] <= self.max_batch_size):
+                item = self._queue.popleft()
+                batch.append(item)
+                rows += item[0].shape[0]
+            self._queued_rows -= rows
+            # Run the batch outside the submitting request's context, since
+            # it serves every request in it
+            task = contextvars.Context().run(asyncio.ensure_future, self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def close(self):
+        """Send whatever is queued and wait for every batch still running."""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run_batch(self, batch):
+        now = time.monotonic()
+        live = []
+        for item in batch:
+            deadline = item[2]
+            if deadline is not None and deadline <= now:
+                if not item[1].done():
+                    item[1].set_exception(DeadlineExceeded(f"Deadline exceeded before {self.name} inference"))
+            else:
+                live.append(item)
+        if not live:
+            return
+        batch = live
+        deadlines = [item[2] for item in batch]
+        deadline = None if None in deadlines else max(deadlines)
+        request_id = ','.join(item[3] for item in batch if item[3]) or None
+
+        if len(batch) == 1:
+            input_data = batch[0][0]
+        else:
+            input_data = np.concatenate([item[0] for item in batch], axis=0)
+        self.batches += 1
+        self.rows += input_data.shape[0]
+        print(f"Running {self.name} batch of {input_data.shape[0]} from {len(batch)} requests")
+
+        try:
+            outputs = await self.infer_batch(input_data, deadline, request_id)
+        except Exception as e:
+            for _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        start = 0
+        for item, future, _, _ in batch:
+            end = start + item.shape[0]
+            if not future.done():
+                future.set_result({name: output[start:end] for name, output in outputs.items()})
+            start = end
@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+
+class ModelMetadataCache:
+    """Cache of Triton model metadata and config keyed by (model name, version).
+
+    Entries expire after `ttl` seconds. When `watch()` is running, the model
+    repository index is polled and entries for models whose loaded versions
+    or state changed are dropped straight away.
+
+    Works with both the tritonclient.http.aio and tritonclient.grpc.aio
+    clients; pass as_json=True for gRPC so entries are plain dicts either way.
+    """
+
+    def __init__(self, client, ttl=300.0, index_poll_interval=30.0, as_json=False):
+        self.client = client
+        self.ttl = ttl
+        self.index_poll_interval = index_poll_interval
+        self._json_kwargs = {'as_json': True} if as_json else {}
+        self._metadata = {}
+        self._config = {}
+        self._pending = {}
+        self._index_state = None
+        # Called with the model name (None for all models) on invalidation
+        self.invalidation_listeners = []
+        self.hits = 0
+        self.misses = 0
+
+    async def get_metadata(self, model_name, model_version=''):
+        return await self._get(self._metadata, 'metadata', model_name, model_version)
+
+    async def get_config(self, model_name, model_version=''):
+        config = await self._get(self._config, 'config', model_name, model_version)
+        # The HTTP client returns the config itself, gRPC wraps it in 'config'
+        return config.get('config', config)
+
+    async def get_version(self, model_name):
+        """Return the newest version Triton reports for a model."""
+        metadata = await self.get_metadata(model_name)
+        versions = [str(version) for version in metadata.get('versions', [])]
+        if not versions:
+            return ''
+        return max(versions, key=lambda v: (v.isdigit(), int(v) if v.isdigit() else 0, v))
+
+    async def warm(self, model_names):
+        """Fetch metadata and config for every model up front."""
+        await asyncio.gather(*(
+            fetch(model_name)
+            for model_name in model_names
+            for fetch in (self.get_metadata, self.get_config)
+        ))
+        print(f"Model metadata cache warmed for: {', '.join(model_names)}")
+
+    def invalidate(self, model_name=None):
+        """Drop cached entries for one model, or for every model."""
+        for store in (self._metadata, self._config):
+            for key in list(store):
+                if model_name is None or key[0] == model_name:
+                    del store[key]
+        for listener in self.invalidation_listeners:
+            listener(model_name)
+
+    async def _get(self, store, kind, model_name, model_version):
+        key = (model_name, str(model_version))
+        entry = store.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        # Concurrent misses for the same entry share a single round trip
+        pending_key = (kind,) + key
+        pending = self._pending.get(pending_key)
+        if pending is None:
+            self.misses += 1
+            pending = asyncio.ensure_future(self._fetch(store, kind, key))
+            self._pending[pending_key] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(pending_key, None))
+        return await asyncio.shield(pending)
+
+    async def _fetch(self, store, kind, key):
+        model_name, model_version = key
+        if kind == 'metadata':
+            value = await self.client.get_model_metadata(model_name, model_version, **self._json_kwargs)
+        else:
+            value = await self.client.get_model_config(model_name, model_version, **self._json_kwargs)
+        print(f"Fetched {kind} for {model_name} (version: {model_version or 'latest'})")
+        store[key] = (time.monotonic() + self.ttl, value)
+        return value
+
+    async def check_repository_index(self):
+        """Invalidate models whose entry in the repository index changed."""
+        index = await self.client.get_model_repository_index(**self._json_kwargs)
+        if isinstance(index, dict):
+            index = index.get('models', [])
+
+        state = {}
+        for model in index:
+            state.setdefault(model['name'], set()).add(
+                (str(model.get('version', '')), model.get('state', ''))
+            )
+
+        if self._index_state is not None:
+            for model_name in set(state) | set(self._index_state):
+                if state.get(model_name) != self._index_state.get(model_name):
+                    print(f"Repository index changed for {model_name}, invalidating cache")
+                    self.invalidate(model_name)
+        self._index_state = state
+
+    async def watch(self):
+        """Poll the repository index until cancelled."""
+        while True:
+            try:
+                await self.check_repository_index()
+            except Exception as e:
+                print(f"Error polling model repository index: {str(e)}")
+            await asyncio.sleep(self.index_poll_interval)
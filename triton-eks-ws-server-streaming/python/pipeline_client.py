@@ -47,7 +47,7 @@ class TritonWebSocketClient:
         self.websocket_url = websocket_url
         print(f"Initialized WebSocket client with URL: {self.websocket_url}")
 
-    async def infer(self, s3_bucket, s3_key):
+    async def infer(self, s3_bucket, s3_key, top_k=None):
         print(f"\nStarting parallel model inference request for:")
         print(f"Image: s3://{s3_bucket}/{s3_key}")
         
@@ -60,6 +60,9 @@ class TritonWebSocketClient:
                 'bucket': s3_bucket,
                 'key': s3_key
             }
+            if top_k:
+                # Server returns only the top_k softmax probabilities
+                request.update({'top_k': top_k, 'softmax': True})
             
             print("\nSending request to server...")
             await websocket.send(json.dumps(request))
@@ -68,8 +71,15 @@ class TritonWebSocketClient:
             response = await websocket.recv()
             return json.loads(response)
 
-    def run_inference(self, s3_bucket, s3_key):
-        return asyncio.run(self.infer(s3_bucket, s3_key))
+    def run_inference(self, s3_bucket, s3_key, top_k=None):
+        return asyncio.run(self.infer(s3_bucket, s3_key, top_k))
+
+def print_server_top_k(output_data, labels, model_label):
+    """Print predictions the server already reduced to top-k probabilities."""
+    print(f"\nTop {len(output_data['class_ids'][0])} {model_label} predictions:")
+    for idx, prob in zip(output_data['class_ids'][0], output_data['scores'][0]):
+        label = labels.get(idx, f"Class {idx}")
+        print(f"{label}: {prob:.4%}")
 
 def process_pipeline_response(response):
     """Process and print the parallel model inference response."""
@@ -84,6 +94,9 @@ def process_pipeline_response(response):
         densenet_outputs = outputs['densenet']
         for output_name, output_data in densenet_outputs.items():
             print(f"\nOutput name: {output_name}")
+            if isinstance(output_data, dict):
+                print_server_top_k(output_data, labels, "DenseNet")
+                continue
             output_array = np.array(output_data)
             print(f"Original output shape: {output_array.shape}")
             
@@ -107,6 +120,9 @@ def process_pipeline_response(response):
         resnet_outputs = outputs['resnet']
         for output_name, output_data in resnet_outputs.items():
             print(f"\nOutput name: {output_name}")
+            if isinstance(output_data, dict):
+                print_server_top_k(output_data, labels, "ResNet")
+                continue
             output_array = np.array(output_data)
             print(f"Output shape: {output_array.shape}")
             
@@ -141,7 +157,7 @@ def test_pipeline():
         
         # Run pipeline inference
         print("\nRunning parallel model inference...")
-        response = client.run_inference(bucket, key)
+        response = client.run_inference(bucket, key, top_k=5)
         
         # Process results
         print("\nProcessing pipeline response...")
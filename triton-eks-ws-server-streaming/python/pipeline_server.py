@@ -1,173 +1,794 @@
+import os
+import time
+import functools
 import socket
-from contextlib import closing
+from contextlib import closing, nullcontext
 import asyncio
 import websockets
 import json
-import boto3
-import io
-from PIL import Image
 import numpy as np
-from tritonclient.utils import *
-import tritonclient.http as httpclient
-
-def preprocess_image(image_bytes):
-    """Preprocess image for both models."""
-    image = Image.open(io.BytesIO(image_bytes))
-    print(f"Original image size: {image.size}")
-    
-    # Resize to model input size
-    image = image.resize((224, 224))
-    print(f"Resized image size: {image.size}")
-    
-    # Convert to RGB if not already
-    image = image.convert('RGB')
-    
-    # Convert to numpy array and normalize
-    image_array = np.array(image)
-    
-    # Transpose from HWC to CHW format
-    image_array = np.transpose(image_array, (2, 0, 1))
-    
-    # Add batch dimension and convert to float32
-    image_array = np.expand_dims(image_array, axis=0).astype(np.float32)
-    print(f"Final array shape: {image_array.shape}")
-    
-    # Normalize to [0, 1]
-    image_array = image_array / 255.0
-    
-    return image_array
+from model_cache import ModelMetadataCache
+from triton_transport import create_transport
+from shared_memory_pool import SharedMemoryPool
+from tensor_frames import BINARY_SUBPROTOCOL, decode_image_frame, encode_tensor_frame
+from micro_batcher import MicroBatcher
+from preprocess_pool import PreprocessPool
+from s3_fetcher import S3Fetcher
+from tensor_cache import TensorCache
+from result_cache import ResultCache, content_hash
+from single_flight import SingleFlight
+from admission import AdmissionController
+from deadlines import DeadlineExceeded, deadline_after, remaining
+from request_trace import current_trace, start_trace, traced
+from metrics import (
+    CACHE_LOOKUPS, COALESCED_REQUESTS, INFLIGHT_REQUESTS, MESSAGE_BYTES, OPEN_CONNECTIONS,
+    QUEUED_REQUESTS, REQUEST_SECONDS, REQUESTS, STAGE_SECONDS, TRITON_QUEUE_SECONDS,
+    start_metrics_server
+)
+from preprocessing import DEFAULT_NORMALIZATION, MAX_IMAGE_PIXELS, PIXEL_VALUES, Normalization, decode_image
+
+def preprocess_image(image_bytes, normalizations=(DEFAULT_NORMALIZATION,),
+                     max_pixels=MAX_IMAGE_PIXELS, out=None, timings=None):
+    """Decode an image once and normalize it for each distinct model input.
+
+    Fills `out` (allocated if not given) with shape
+    (len(normalizations), 3, 224, 224); row i is the NCHW float32 input for
+    normalizations[i]. If a `timings` dict is given, the seconds spent in
+    'decode' and 'preprocess' are recorded in it.
+    """
+    start = time.perf_counter()
+    # Decode directly near the model input size, then resize to it
+    image = decode_image(image_bytes, (224, 224), max_pixels)
+    pixels = np.asarray(image)
+    decoded = time.perf_counter()
+    if out is None:
+        out = np.empty((len(normalizations), 3, 224, 224), dtype=np.float32)
+    for row, normalization in enumerate(normalizations):
+        normalization.apply(pixels, out[row])
+    if timings is not None:
+        timings['decode'] = decoded - start
+        timings['preprocess'] = time.perf_counter() - decoded
+    return out
+
+def softmax_outputs(output_data):
+    """Softmax over each row of [batch, classes, ...] scores, keeping their shape."""
+    scores = output_data.reshape(output_data.shape[0], -1).astype(np.float32, copy=False)
+    scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+    scores /= scores.sum(axis=1, keepdims=True)
+    return scores.reshape(output_data.shape)
+
+def top_k_outputs(output_data, k, softmax=False):
+    """Reduce [batch, classes, ...] scores to each row's top k class ids and scores."""
+    scores = output_data.reshape(output_data.shape[0], -1).astype(np.float32, copy=False)
+    if softmax:
+        scores = softmax_outputs(scores)
+
+    k = min(k, scores.shape[1])
+    class_ids = np.argpartition(scores, -k, axis=1)[:, -k:]
+    top_scores = np.take_along_axis(scores, class_ids, axis=1)
+    # argpartition leaves the top k unordered; sort just those, best first
+    order = np.argsort(-top_scores, axis=1)
+    return {
+        'class_ids': np.take_along_axis(class_ids, order, axis=1),
+        'scores': np.take_along_axis(top_scores, order, axis=1)
+    }
+
+# Triton input datatypes the server can send, and their numpy dtypes
+INPUT_DATATYPES = {
+    'FP32': np.float32,
+    'UINT8': np.uint8
+}
+
+# Response key -> Triton model name. Every model receives the same
+# preprocessed tensor.
+DEFAULT_MODELS = {
+    'densenet': 'densenet_onnx',
+    'resnet': 'resnet50_onnx'
+}
+
+# Seconds between attempts to read model metadata while Triton starts up
+STARTUP_RETRY_INTERVAL = 2.0
 
 class TritonWebSocketServer:
-    def __init__(self, triton_url="localhost:8000", websocket_port=None):
-        self.triton_url = triton_url
+    def __init__(self, triton_url=None, websocket_port=None, triton_conn_limit=256,
+                 models=None, fan_out=True, metadata_ttl=300.0, index_poll_interval=30.0,
+                 batching=False, batch_delay_ms=5.0, max_batch_size=None,
+                 max_inflight_per_connection=8, preprocess_workers=None, preprocess_mode='process',
+                 s3_max_connections=64, tensor_cache_bytes=512*1024*1024, tensor_cache_revalidate_after=30.0,
+                 tensor_cache_spill_dir=None, result_cache_bytes=256*1024*1024, result_cache_ttl=300.0,
+                 max_image_pixels=MAX_IMAGE_PIXELS, preprocessing=None, coalesce_requests=True,
+                 max_inflight_requests=256, max_queued_requests=512, max_queue_wait_ms=1000.0,
+                 triton_queue_threshold_ms=500.0, queue_poll_interval=1.0, metrics_port=8081,
+                 host="localhost", reuse_port=False, transport='http', triton_streams=1,
+                 shared_memory=False, shared_memory_regions=8, shared_memory_region_bytes=8*1024*1024,
+                 startup_timeout=300.0):
+        # 'http', 'grpc' or 'grpc_stream' (see triton_transport.py);
+        # triton_url defaults to the transport's local port and grpc_stream
+        # multiplexes requests over `triton_streams` streams. The client owns
+        # an aiohttp session or gRPC channels, so it is created on the
+        # server's event loop in start_server()
+        # With shared_memory, tensors for a Triton in the same container go
+        # through pre-registered /dev/shm regions instead of the socket; size
+        # /dev/shm for regions x region bytes per server process
+        self.transport = create_transport(
+            transport, triton_url, conn_limit=triton_conn_limit, streams=triton_streams,
+            shared_memory=SharedMemoryPool(
+                regions=shared_memory_regions,
+                region_bytes=shared_memory_region_bytes
+            ) if shared_memory else None
+        )
+        self.triton_url = self.transport.url
+        self.host = host
+        # With reuse_port several server processes bind the same port and the
+        # kernel spreads incoming connections across them (see server_launcher.py)
+        self.reuse_port = reuse_port
         self.websocket_port = websocket_port if websocket_port else self._find_available_port()
-        self.triton_client = httpclient.InferenceServerClient(url=triton_url)
-        self.s3_client = boto3.client('s3')
-        print(f"Initialized Triton client with URL: {triton_url}")
+        self.triton_conn_limit = triton_conn_limit
+        self.models = dict(models) if models else dict(DEFAULT_MODELS)
+        # Send every model's request at once and join on the results, so
+        # latency tracks the slowest model instead of the sum of all of them
+        self.fan_out = fan_out
+        self.metadata_ttl = metadata_ttl
+        self.index_poll_interval = index_poll_interval
+        self.model_cache = None
+        # Cross-connection micro-batching: requests for the same model are
+        # held for up to batch_delay_ms and sent to Triton as one batch of at
+        # most the model's max_batch_size (optionally capped further)
+        self.batching = batching
+        self.batch_delay_ms = batch_delay_ms
+        self.max_batch_size = max_batch_size
+        self.batchers = {}
+        self.max_inflight_per_connection = max_inflight_per_connection
+        # Image decode and preprocessing run in a worker pool instead of on the
+        # event loop. Size it to the pod's CPU limit via PREPROCESS_WORKERS;
+        # 0 keeps preprocessing inline.
+        if preprocess_workers is None:
+            preprocess_workers = int(os.environ.get('PREPROCESS_WORKERS', os.cpu_count() or 1))
+        # Per-model {'scale', 'mean', 'std'} by Triton model name; models
+        # without an entry get pixels scaled to [0, 1]. Each image is decoded
+        # once and normalized into one row per distinct setting.
+        self.preprocessing = preprocessing or {}
+        self.max_image_pixels = max_image_pixels
+        self.preprocess_workers = preprocess_workers
+        self.preprocess_mode = preprocess_mode
+        # Input datatype per Triton model, read from its metadata when the
+        # server starts. UINT8 models (e.g. the ensembles generated by
+        # make_uint8_models.py) are sent raw pixels and normalize them
+        # inside Triton; everything else gets normalized FP32.
+        self.input_datatypes = {}
+        self.preprocess_pool = self._build_preprocess_pool()
+        # S3 GETs run on a pooled client off the event loop
+        self.s3_fetcher = S3Fetcher(max_connections=s3_max_connections)
+        # Preprocessed tensors by bucket/key/ETag, so repeat requests skip the
+        # S3 download and preprocessing (0 bytes disables the cache)
+        self.tensor_cache = TensorCache(
+            max_bytes=tensor_cache_bytes,
+            revalidate_after=tensor_cache_revalidate_after,
+            spill_dir=tensor_cache_spill_dir
+        ) if tensor_cache_bytes else None
+        # Model outputs by input content hash, model and version, so repeated
+        # images and frames skip Triton entirely (0 bytes disables the cache)
+        self.result_cache = ResultCache(
+            max_bytes=result_cache_bytes,
+            ttl=result_cache_ttl
+        ) if result_cache_bytes else None
+        # Concurrent requests for the same S3 object share one download,
+        # preprocessing and inference run
+        self.coalescer = SingleFlight() if coalesce_requests else None
+        # Admission control across all connections: requests beyond the
+        # in-flight limit wait in a bounded queue, and are answered with an
+        # immediate "overloaded" reply when it is full, when they wait longer
+        # than max_queue_wait_ms, or while Triton's average queue time is
+        # above triton_queue_threshold_ms (0 disables that check)
+        self.admission = AdmissionController(
+            max_inflight=max_inflight_requests,
+            max_queued=max_queued_requests,
+            max_queue_wait=max_queue_wait_ms / 1000.0,
+            triton_queue_threshold=triton_queue_threshold_ms / 1000.0
+        )
+        self.queue_poll_interval = queue_poll_interval
+        # Prometheus /metrics on its own HTTP port (None to disable)
+        self.metrics_port = metrics_port
+        # Seconds start_server() waits for Triton to serve every model's
+        # metadata (it may still be loading them) before giving up
+        self.startup_timeout = startup_timeout
+
+    def _build_preprocess_pool(self):
+        normalizations = []
+        self.input_rows = {}
+        for key, model_name in self.models.items():
+            if self.input_datatypes.get(model_name) == 'UINT8':
+                normalization = PIXEL_VALUES
+            else:
+                normalization = Normalization.from_config(
+                    self.preprocessing.get(model_name, DEFAULT_NORMALIZATION)
+                )
+            row = next(
+                (row for row, existing in enumerate(normalizations) if existing.key() == normalization.key()),
+                None
+            )
+            if row is None:
+                row = len(normalizations)
+                normalizations.append(normalization)
+            self.input_rows[key] = row
+        return PreprocessPool(
+            functools.partial(
+                preprocess_image,
+                normalizations=tuple(normalizations),
+                max_pixels=self.max_image_pixels
+            ),
+            workers=self.preprocess_workers,
+            mode=self.preprocess_mode,
+            output_shape=(len(normalizations), 3, 224, 224)
+        )
 
-    async def run_model_inference(self, model_name, input_tensor):
-        """Run inference for a single model."""
+    async def configure_inputs(self):
+        """Pick each model's input datatype from its metadata and lay out the input rows.
+
+        The datatypes are fixed for the life of the process, so rather than
+        guess one, this retries until Triton serves every model's metadata
+        and raises once startup_timeout has passed.
+        """
+        give_up = time.monotonic() + self.startup_timeout
+        for model_name in sorted(set(self.models.values())):
+            while True:
+                try:
+                    metadata = await self.model_cache.get_metadata(model_name)
+                    break
+                except Exception as e:
+                    if time.monotonic() >= give_up:
+                        raise RuntimeError(f"Could not read metadata for {model_name} from Triton: {str(e)}")
+                    print(f"Waiting for {model_name} metadata from Triton: {str(e)}")
+                    await asyncio.sleep(STARTUP_RETRY_INTERVAL)
+            datatype = metadata['inputs'][0]['datatype']
+            if datatype not in INPUT_DATATYPES:
+                raise ValueError(f"Unsupported input datatype {datatype} for {model_name}")
+            self.input_datatypes[model_name] = datatype
+            print(f"Sending {datatype} input to {model_name}")
+        self.preprocess_pool = self._build_preprocess_pool()
+
+    async def run_model_inference(self, model_name, input_name, input_data, datatype,
+                                  deadline=None, request_id='', output_metadata=None):
+        """Run inference for a single model and return its outputs."""
         print(f"\nRunning inference for model: {model_name}")
+        timeout = remaining(deadline, f"{model_name} inference")
         try:
-            response = self.triton_client.infer(
-                model_name=model_name,
-                inputs=[input_tensor]
-            )
+            # Triton gets the remaining budget and may drop the request once
+            # it runs out; we also stop waiting for it then
+            outputs = await asyncio.wait_for(self.transport.infer(
+                model_name, input_name, input_data, datatype,
+                request_id=request_id or '',
+                timeout=timeout,
+                outputs=output_metadata
+            ), timeout)
             print(f"Inference completed for {model_name}")
-            return response
+            return outputs
+        except asyncio.TimeoutError:
+            if deadline is None:
+                # Not our deadline: a timeout inside the transport
+                print(f"Error during {model_name} inference: timed out")
+                raise
+            raise DeadlineExceeded(f"Deadline exceeded during {model_name} inference")
         except Exception as e:
             print(f"Error during {model_name} inference: {str(e)}")
             raise
 
+    async def infer_model(self, model_name, input_data, input_hash=None, deadline=None):
+        """Run inference for a model and return its outputs as numpy arrays."""
+        if self.result_cache and input_hash:
+            with traced('metadata'):
+                model_version = await self.model_cache.get_version(model_name)
+            outputs = self.result_cache.get(input_hash, model_name, model_version)
+            if outputs is not None:
+                print(f"Result cache hit for {model_name}")
+                CACHE_LOOKUPS.labels(cache='result', result='hit').inc()
+                return outputs
+            CACHE_LOOKUPS.labels(cache='result', result='miss').inc()
+
+        remaining(deadline, f"{model_name} inference")
+        # Traced requests carry their trace ID into Triton's request ID
+        trace = current_trace()
+        request_id = trace.trace_id if trace else None
+        if self.batching:
+            batcher = await self.get_batcher(model_name)
+            outputs = await batcher.submit(input_data, deadline, request_id)
+        else:
+            outputs = await self.infer_batch(model_name, input_data, deadline, request_id)
+
+        if self.result_cache and input_hash:
+            self.result_cache.put(input_hash, model_name, model_version, outputs)
+        return outputs
+
+    async def get_batcher(self, model_name):
+        """Return the micro-batcher for a model, sized from its Triton config."""
+        batcher = self.batchers.get(model_name)
+        if batcher is None:
+            config = await self.model_cache.get_config(model_name)
+            # max_batch_size 0 means the model does not accept a batch dimension
+            # beyond the one in its input shape, so requests go through one by one
+            batch_size = max(1, int(config.get('max_batch_size', 0)))
+            if self.max_batch_size:
+                batch_size = min(batch_size, self.max_batch_size)
+            batcher = self.batchers.setdefault(model_name, MicroBatcher(
+                model_name,
+                lambda batch, deadline, request_id: self.infer_batch(model_name, batch, deadline, request_id),
+                batch_size,
+                max_delay=self.batch_delay_ms / 1000.0
+            ))
+        return batcher
+
+    async def infer_batch(self, model_name, input_data, deadline=None, request_id=None):
+        """Build the input tensor for a model and run inference on it."""
+        with traced('metadata'):
+            metadata = await self.model_cache.get_metadata(model_name)
+        input_name = metadata['inputs'][0]['name']
+        datatype = self.input_datatypes.get(model_name, 'FP32')
+        print(f"Using {model_name} input name: {input_name}")
+
+        # UINT8 rows hold exact pixel values, so the cast is lossless
+        input_data = input_data.astype(INPUT_DATATYPES[datatype], copy=False)
+        with STAGE_SECONDS.labels(stage='inference', model=model_name).time():
+            return await self.run_model_inference(
+                model_name, input_name, input_data, datatype, deadline, request_id,
+                output_metadata=metadata['outputs']
+            )
+
+    async def run_pipeline_models(self, input_data, deadline=None, on_result=None):
+        """Run every configured model on its row of the input, keyed by response key.
+
+        If given, `await on_result(key, outputs)` is called as each model
+        finishes. Every model then runs to completion before the first
+        failure, if any, is raised, so no result arrives after the error.
+        """
+        rows = {}
+        for row in set(self.input_rows.values()):
+            model_input = input_data[row:row + 1]
+            rows[row] = (model_input, content_hash(model_input) if self.result_cache else None)
+        requests = [
+            (key, model_name) + rows[self.input_rows[key]] + (deadline,)
+            for key, model_name in self.models.items()
+        ]
+
+        async def infer(key, *request):
+            with traced(f"infer_{key}"):
+                outputs = await self.infer_model(*request)
+            if on_result is not None:
+                await on_result(key, outputs)
+            return outputs
+
+        if self.fan_out:
+            responses = await asyncio.gather(
+                *(infer(*request) for request in requests),
+                return_exceptions=on_result is not None
+            )
+        else:
+            responses = []
+            for request in requests:
+                try:
+                    responses.append(await infer(*request))
+                except Exception as e:
+                    if on_result is None:
+                        raise
+                    responses.append(e)
+        for response in responses:
+            if isinstance(response, BaseException):
+                raise response
+        return dict(zip(self.models, responses))
+
+    async def load_input(self, s3_bucket, s3_key, deadline=None):
+        """Return the preprocessed input for an S3 object, using the tensor cache."""
+        cached = await self.tensor_cache.lookup(s3_bucket, s3_key) if self.tensor_cache else None
+        if cached is not None:
+            etag, tensor, fresh = cached
+            if fresh:
+                print(f"Tensor cache hit for s3://{s3_bucket}/{s3_key}")
+                CACHE_LOOKUPS.labels(cache='tensor', result='hit').inc()
+                return tensor
+        print(f"Loading image from s3://{s3_bucket}/{s3_key}")
+
+        # Get image from S3, conditionally if an older copy is cached
+        try:
+            with STAGE_SECONDS.labels(stage='s3_fetch', model='').time(), traced('s3_get'):
+                s3_object = await self.s3_fetcher.fetch(
+                    s3_bucket,
+                    s3_key,
+                    if_none_match=cached[0] if cached else None,
+                    timeout=remaining(deadline, "S3 fetch")
+                )
+            print("Successfully loaded image from S3")
+        except asyncio.TimeoutError:
+            if deadline is None:
+                print("Error loading from S3: timed out")
+                raise
+            raise DeadlineExceeded("Deadline exceeded during S3 fetch")
+        except Exception as e:
+            print(f"Error loading from S3: {str(e)}")
+            raise
+
+        if s3_object.not_modified:
+            print(f"Tensor cache revalidated for s3://{s3_bucket}/{s3_key}")
+            CACHE_LOOKUPS.labels(cache='tensor', result='revalidated').inc()
+            self.tensor_cache.confirm(s3_bucket, s3_key, cached[0])
+            return cached[1]
+        if self.tensor_cache:
+            CACHE_LOOKUPS.labels(cache='tensor', result='miss').inc()
+        MESSAGE_BYTES.labels(direction='s3_object').observe(len(s3_object.body))
+
+        input_data = await self.preprocess_input(s3_object.body, deadline)
+        if self.tensor_cache and s3_object.etag:
+            input_data = self.tensor_cache.put(s3_bucket, s3_key, s3_object.etag, input_data)
+        return input_data
+
+    async def preprocess_input(self, image_bytes, deadline=None):
+        """Preprocess image bytes in the pool (decoded once for every model)."""
+        remaining(deadline, "preprocessing")
+        trace = current_trace()
+        timings = {} if trace else None
+        with STAGE_SECONDS.labels(stage='preprocess', model='').time():
+            input_data = await self.preprocess_pool.run(image_bytes, timings)
+        for stage, seconds in (timings or {}).items():
+            trace.add(stage, seconds)
+        return input_data
+
+    async def run_upload(self, image_bytes, deadline=None, on_result=None):
+        """Preprocess an image sent with the request and run every model on it.
+
+        Uploads skip the tensor cache and coalescing, which are keyed by S3
+        object; repeated images still hit the result cache.
+        """
+        input_data = await self.preprocess_input(image_bytes, deadline)
+        print(f"Preprocessed input shape: {input_data.shape}")
+
+        try:
+            return await self.run_pipeline_models(input_data, deadline, on_result)
+        except Exception as e:
+            print(f"Error during model inference: {str(e)}")
+            raise
+
+    async def run_s3_object(self, s3_bucket, s3_key, deadline=None):
+        """Load an S3 object's input and run every model on it."""
+        input_data = await self.load_input(s3_bucket, s3_key, deadline)
+        print(f"Preprocessed input shape: {input_data.shape}")
+
+        try:
+            return await self.run_pipeline_models(input_data, deadline)
+        except Exception as e:
+            print(f"Error during model inference: {str(e)}")
+            raise
+
+    async def stream_s3_object(self, s3_bucket, s3_key, on_result, deadline=None):
+        """Like run_s3_object(), but hand each model's outputs to `on_result` as they arrive."""
+        if self.coalescer:
+            # Only the input is shared with concurrent requests for the
+            # object; each streaming request runs its own models
+            input_data = await self.coalescer.run(
+                ('input', s3_bucket, s3_key),
+                lambda: self.load_input(s3_bucket, s3_key, deadline),
+                deadline
+            )
+        else:
+            input_data = await self.load_input(s3_bucket, s3_key, deadline)
+        print(f"Preprocessed input shape: {input_data.shape}")
+        await self.run_pipeline_models(input_data, deadline, on_result)
+
     async def handle_inference(self, websocket):
+        # Clients that negotiated the binary subprotocol get raw tensor frames
+        binary_responses = websocket.subprotocol == BINARY_SUBPROTOCOL
+        # Messages on one connection are processed concurrently, up to
+        # max_inflight_per_connection at a time. Replies are sent as soon as
+        # they are ready and echo the client's request_id for matching.
+        inflight = asyncio.Semaphore(self.max_inflight_per_connection)
+        tasks = set()
+
+        def request_done(task):
+            tasks.discard(task)
+            inflight.release()
+
+        OPEN_CONNECTIONS.inc()
         try:
             async for message in websocket:
-                print("\n--- Starting parallel model inference request ---")
+                await inflight.acquire()
+                task = asyncio.create_task(
+                    self.process_request(websocket, message, binary_responses)
+                )
+                tasks.add(task)
+                task.add_done_callback(request_done)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            OPEN_CONNECTIONS.dec()
+
+    async def process_request(self, websocket, message, binary_responses):
+        """Run the pipeline for one request message and send its reply."""
+        request_id = None
+        trace = None
+        stream = False
+        # Response keys already sent in streaming mode
+        models_sent = []
+        received = time.monotonic()
+        # Reply status, for the request metrics
+        status = 'error'
+        # Image bytes from a binary request, instead of an S3 object
+        image = None
+        MESSAGE_BYTES.labels(direction='received').observe(len(message))
+        try:
+            print("\n--- Starting parallel model inference request ---")
+            if isinstance(message, bytes):
+                # The image is a view over the received message. Inline and
+                # thread preprocessing decode from it without copying it;
+                # process mode copies it once to send to a worker
+                request_data, image = decode_image_frame(message)
+            else:
                 try:
                     request_data = json.loads(message)
                 except json.JSONDecodeError as e:
                     print(f"Error decoding JSON: {str(e)}")
                     print(f"Received message: {message}")
                     raise
-                
-                print(f"Received request data: {request_data}")
-                
+            
+            print(f"Received request data: {request_data}")
+            request_id = request_data.get('request_id')
+            # Optional server-side post-processing: only the top_k class ids
+            # and scores are returned, and softmax turns scores (top_k or
+            # the full outputs) into probabilities
+            top_k = request_data.get('top_k')
+            if top_k is not None and (isinstance(top_k, bool) or not isinstance(top_k, int) or top_k < 1):
+                raise ValueError(f"top_k must be a positive integer, got: {top_k}")
+            softmax = bool(request_data.get('softmax', False))
+            # Streaming mode: one 'partial' message per model as soon as it
+            # finishes, then a final 'success' message without outputs
+            stream = bool(request_data.get('stream', False))
+            # Opt-in per-stage timing, returned under 'trace'. The trace ID
+            # (the client's trace_id, or a generated one) is used as the
+            # Triton request ID so server and Triton logs can be matched.
+            if request_data.get('trace'):
+                trace = start_trace(request_data.get('trace_id'))
+            # Optional time budget for the request: stages are skipped once
+            # it has run out, and what is left is passed on to S3 and Triton
+            deadline_ms = request_data.get('deadline_ms')
+            if deadline_ms is not None and (
+                    isinstance(deadline_ms, bool) or not isinstance(deadline_ms, (int, float)) or deadline_ms <= 0):
+                raise ValueError(f"deadline_ms must be a positive number, got: {deadline_ms}")
+            deadline = deadline_after(deadline_ms)
+            
+            if image is None:
                 try:
                     s3_bucket = request_data['bucket']
                     s3_key = request_data['key']
                 except KeyError as e:
                     print(f"Missing required field: {str(e)}")
                     raise ValueError(f"Request missing required field: {str(e)}")
-                
-                print(f"Loading image from s3://{s3_bucket}/{s3_key}")
+            
+            QUEUED_REQUESTS.inc()
+            try:
+                started = await self.admission.acquire()
+            finally:
+                QUEUED_REQUESTS.dec()
+            if started is None:
+                status = 'overloaded'
+                await self.send_overloaded(websocket, request_id)
+                return
+            INFLIGHT_REQUESTS.inc()
 
-                # Get image from S3
-                try:
-                    response = self.s3_client.get_object(Bucket=s3_bucket, Key=s3_key)
-                    image_bytes = response['Body'].read()
-                    print("Successfully loaded image from S3")
-                except Exception as e:
-                    print(f"Error loading from S3: {str(e)}")
-                    raise
-                
-                # Preprocess image (same preprocessing for both models)
-                input_data = preprocess_image(image_bytes)
-                print(f"Preprocessed input shape: {input_data.shape}")
-                
-                try:
-                    # DenseNet inference
-                    densenet_metadata = self.triton_client.get_model_metadata('densenet_onnx')
-                    densenet_input_name = densenet_metadata['inputs'][0]['name']
-                    print(f"Using DenseNet input name: {densenet_input_name}")
-                    
-                    densenet_input = httpclient.InferInput(
-                        densenet_input_name,
-                        input_data.shape,
-                        "FP32"
-                    )
-                    densenet_input.set_data_from_numpy(input_data)
-                    densenet_response = await self.run_model_inference('densenet_onnx', densenet_input)
-                    
-                    # ResNet inference (using same preprocessed input)
-                    resnet_metadata = self.triton_client.get_model_metadata('resnet50_onnx')
-                    resnet_input_name = resnet_metadata['inputs'][0]['name']
-                    print(f"Using ResNet input name: {resnet_input_name}")
-                    
-                    resnet_input = httpclient.InferInput(
-                        resnet_input_name,
-                        input_data.shape,
-                        "FP32"
-                    )
-                    resnet_input.set_data_from_numpy(input_data)
-                    resnet_response = await self.run_model_inference('resnet50_onnx', resnet_input)
-                    
-                except Exception as e:
-                    print(f"Error during model inference: {str(e)}")
-                    raise
-                
-                # Process outputs
-                try:
-                    pipeline_outputs = {
-                        'densenet': {},
-                        'resnet': {}
-                    }
-                    
-                    # Process DenseNet outputs
-                    for output in densenet_response.get_response()['outputs']:
-                        output_name = output['name']
-                        output_data = densenet_response.as_numpy(output_name)
-                        pipeline_outputs['densenet'][output_name] = output_data.tolist()
-                    
-                    # Process ResNet outputs
-                    for output in resnet_response.get_response()['outputs']:
-                        output_name = output['name']
-                        output_data = resnet_response.as_numpy(output_name)
-                        pipeline_outputs['resnet'][output_name] = output_data.tolist()
-                    
-                    await websocket.send(json.dumps({
-                        'status': 'success',
-                        'outputs': pipeline_outputs
-                    }))
-                    print("Pipeline response sent to client")
-                except Exception as e:
-                    print(f"Error processing outputs: {str(e)}")
-                    raise
+            async def send_partial(key, model_outputs):
+                header = {'status': 'partial', 'model': key}
+                if request_id is not None:
+                    header['request_id'] = request_id
+                with STAGE_SECONDS.labels(stage='serialize', model=self.models[key]).time():
+                    with traced('serialize'):
+                        outputs = {key: self.format_outputs(model_outputs, top_k, softmax, binary_responses)}
+                        payload = self.encode_reply(header, outputs, binary_responses)
+                MESSAGE_BYTES.labels(direction='sent').observe(len(payload))
+                with STAGE_SECONDS.labels(stage='send', model=self.models[key]).time():
+                    await websocket.send(payload)
+                models_sent.append(key)
+                print(f"Partial response for {key} sent to client")
+
+            try:
+                if image is not None:
+                    model_responses = await self.run_upload(image, deadline, send_partial if stream else None)
+                    if stream:
+                        model_responses = {}
+                elif stream:
+                    try:
+                        await asyncio.wait_for(
+                            self.stream_s3_object(s3_bucket, s3_key, send_partial, deadline),
+                            remaining(deadline, "S3 fetch")
+                        )
+                    except asyncio.TimeoutError:
+                        if deadline is None:
+                            raise
+                        raise DeadlineExceeded("Deadline exceeded waiting for the pipeline")
+                    model_responses = {}
+                elif self.coalescer:
+                    coalesced = self.coalescer.in_flight((s3_bucket, s3_key), deadline)
+                    if coalesced:
+                        COALESCED_REQUESTS.inc()
+                    # A request only joins a run whose deadline is no
+                    # earlier than its own, so the run has the latest of its
+                    # requests' deadlines (passed on to S3 and Triton), and
+                    # every request stops waiting at its own
+                    try:
+                        # A coalesced request's stages are traced by the
+                        # request that started the shared run
+                        with traced('coalesced_wait') if coalesced else nullcontext():
+                            model_responses = await asyncio.wait_for(self.coalescer.run(
+                                (s3_bucket, s3_key),
+                                lambda: self.run_s3_object(s3_bucket, s3_key, deadline),
+                                deadline
+                            ), remaining(deadline, "S3 fetch"))
+                    except asyncio.TimeoutError:
+                        if deadline is None:
+                            raise
+                        raise DeadlineExceeded("Deadline exceeded waiting for the pipeline")
+                else:
+                    model_responses = await self.run_s3_object(s3_bucket, s3_key, deadline)
+            finally:
+                self.admission.release(started)
+                INFLIGHT_REQUESTS.dec()
+            
+            # Process outputs
+            try:
+                with STAGE_SECONDS.labels(stage='serialize', model='').time():
+                    with traced('serialize'):
+                        pipeline_outputs = {
+                            key: self.format_outputs(model_outputs, top_k, softmax, binary_responses)
+                            for key, model_outputs in model_responses.items()
+                        }
+
+                    header = {'status': 'success'}
+                    if request_id is not None:
+                        header['request_id'] = request_id
+                    if stream:
+                        # The outputs went out in the partial messages
+                        header['models'] = models_sent
+                    if trace is not None:
+                        header['trace'] = trace.to_dict()
+                    payload = self.encode_reply(header, pipeline_outputs, binary_responses)
+                MESSAGE_BYTES.labels(direction='sent').observe(len(payload))
+                with STAGE_SECONDS.labels(stage='send', model='').time():
+                    await websocket.send(payload)
+                status = 'success'
+                print("Pipeline response sent to client")
+            except Exception as e:
+                print(f"Error processing outputs: {str(e)}")
+                raise
 
+        except websockets.exceptions.ConnectionClosed:
+            status = 'disconnected'
+            print("Client disconnected before the response was sent")
         except Exception as e:
-            error_msg = {'status': 'error', 'message': str(e)}
+            status = 'deadline_exceeded' if isinstance(e, DeadlineExceeded) else 'error'
+            error_msg = {'status': status, 'message': str(e)}
+            if request_id is not None:
+                error_msg['request_id'] = request_id
+            if stream:
+                error_msg['models'] = models_sent
+            if trace is not None:
+                error_msg['trace'] = trace.to_dict()
             print(f"Server error: {str(e)}")
-            await websocket.send(json.dumps(error_msg))
+            try:
+                await websocket.send(json.dumps(error_msg))
+            except websockets.exceptions.ConnectionClosed:
+                pass
+        finally:
+            REQUESTS.labels(status=status).inc()
+            REQUEST_SECONDS.labels(status=status).observe(time.monotonic() - received)
+
+    def format_outputs(self, model_outputs, top_k=None, softmax=False, binary_responses=False):
+        """One model's outputs as sent to the client: arrays for frames, lists for JSON."""
+        formatted = {}
+        for output_name, output_data in model_outputs.items():
+            if top_k is not None:
+                output_data = top_k_outputs(output_data, top_k, softmax)
+                if not binary_responses:
+                    output_data = {
+                        name: values.tolist() for name, values in output_data.items()
+                    }
+                formatted[output_name] = output_data
+            else:
+                if softmax:
+                    output_data = softmax_outputs(output_data)
+                formatted[output_name] = output_data if binary_responses else output_data.tolist()
+        return formatted
+
+    def encode_reply(self, header, outputs, binary_responses=False):
+        if binary_responses:
+            return encode_tensor_frame(header, outputs)
+        if not outputs:
+            return json.dumps(header)
+        return json.dumps(dict(header, outputs=outputs))
+
+    async def send_overloaded(self, websocket, request_id):
+        """Tell the client to back off instead of queueing its request."""
+        retry_after_ms = int(self.admission.retry_after() * 1000)
+        print(f"Server overloaded, shedding request (retry after {retry_after_ms} ms): "
+              f"{self.admission.stats()}")
+        overloaded_msg = {
+            'status': 'overloaded',
+            'message': 'Server overloaded, retry later',
+            'retry_after_ms': retry_after_ms
+        }
+        if request_id is not None:
+            overloaded_msg['request_id'] = request_id
+        await websocket.send(json.dumps(overloaded_msg))
+
+    async def watch_triton_queue(self):
+        """Poll Triton's inference statistics for the average queue time until cancelled."""
+        previous = {}
+        while True:
+            try:
+                statistics = await self.transport.get_inference_statistics()
+                queue_time = 0.0
+                for model in statistics.get('model_stats', []):
+                    queue = model.get('inference_stats', {}).get('queue', {})
+                    key = (model['name'], model.get('version', ''))
+                    count, ns = int(queue.get('count', 0)), int(queue.get('ns', 0))
+                    last_count, last_ns = previous.get(key, (count, ns))
+                    previous[key] = (count, ns)
+                    # Average over the requests queued since the last poll
+                    if count > last_count:
+                        queue_time = max(queue_time, (ns - last_ns) / (count - last_count) / 1e9)
+                self.admission.triton_queue_time = queue_time
+                TRITON_QUEUE_SECONDS.set(queue_time)
+            except Exception as e:
+                print(f"Error polling Triton inference statistics: {str(e)}")
+            await asyncio.sleep(self.queue_poll_interval)
 
     async def start_server(self):
-        async with websockets.serve(
-            self.handle_inference, 
-            "localhost", 
-            self.websocket_port,
-            max_size=1024*1024*1024,
-            max_queue=16
-        ):
-            print(f"WebSocket server started on ws://localhost:{self.websocket_port}")
-            await asyncio.Future()
+        await self.transport.start()
+        self.model_cache = ModelMetadataCache(
+            self.transport.client,
+            ttl=self.metadata_ttl,
+            index_poll_interval=self.index_poll_interval,
+            as_json=self.transport.as_json
+        )
+        if self.result_cache:
+            # A new model version makes that model's cached outputs stale
+            self.model_cache.invalidation_listeners.append(self.result_cache.invalidate_model)
+        try:
+            await self.model_cache.warm(list(self.models.values()))
+        except Exception as e:
+            # Entries are fetched lazily on first use if Triton isn't ready yet
+            print(f"Could not warm model metadata cache: {str(e)}")
+        try:
+            await self.configure_inputs()
+        except Exception:
+            await self.transport.close()
+            raise
+        watch_task = asyncio.create_task(self.model_cache.watch())
+        queue_watch_task = asyncio.create_task(self.watch_triton_queue())
+        self.preprocess_pool.start()
+        if self.metrics_port:
+            start_metrics_server(self.metrics_port)
+        try:
+            async with websockets.serve(
+                self.handle_inference, 
+                self.host, 
+                self.websocket_port,
+                max_size=1024*1024*1024,
+                max_queue=16,
+                select_subprotocol=self._select_subprotocol,
+                reuse_port=self.reuse_port
+            ):
+                print(f"WebSocket server started on ws://{self.host}:{self.websocket_port} (pid {os.getpid()})")
+                await asyncio.Future()
+        finally:
+            watch_task.cancel()
+            queue_watch_task.cancel()
+            # Batches still running need the transport
+            await asyncio.gather(*(batcher.close() for batcher in self.batchers.values()))
+            self.preprocess_pool.close()
+            self.s3_fetcher.close()
+            await self.transport.close()
+
+    def _select_subprotocol(self, connection, subprotocols):
+        # Clients that don't offer a subprotocol are accepted and get JSON
+        if BINARY_SUBPROTOCOL in subprotocols:
+            return BINARY_SUBPROTOCOL
+        return None
 
     def _find_available_port(self):
         with closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as s:
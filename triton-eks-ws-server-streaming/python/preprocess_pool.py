@@ -0,0 +1,153 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Shared-memory segments attached by this worker process, by name
+_attached_segments = {}
+
+
+def _attach_segment(name):
+    segment = _attached_segments.get(name)
+    if segment is None:
+        # Pool workers share the server's resource tracker, so attaching here
+        # does not hand ownership (or unlinking) of the segment to the worker
+        segment = shared_memory.SharedMemory(name=name)
+        _attached_segments[name] = segment
+    return segment
+
+
+def _preprocess_into_slot(preprocess_fn, image_bytes, segment_name, slot, shape, dtype, timed):
+    """Worker entry point: preprocess an image straight into a shared-memory slot.
+
+    Returns the stage timings preprocess_fn recorded when `timed` is set.
+    """
+    segment = _attach_segment(segment_name)
+    dtype = np.dtype(dtype)
+    slot_bytes = int(np.prod(shape)) * dtype.itemsize
+    out = np.ndarray(shape, dtype=dtype, buffer=segment.buf, offset=slot * slot_bytes)
+    if not timed:
+        preprocess_fn(image_bytes, out=out)
+        return None
+    timings = {}
+    preprocess_fn(image_bytes, out=out, timings=timings)
+    return timings
+
+
+class PreprocessPool:
+    """Runs image preprocessing off the event loop.
+
+    mode='process' uses a process pool. Workers write each result into a slot
+    of a shared-memory segment owned by the server, so only the image bytes
+    and a slot index cross the process boundary. mode='thread' uses a thread
+    pool and relies on PIL and numpy releasing the GIL. workers=0 runs
+    preprocessing inline on the event loop, as before.
+
+    `preprocess_fn` must be a module-level function (or a partial of one)
+    returning an array of `output_shape` and `dtype`, and accepting an `out`
+    array of that shape to write the result into instead of allocating, and
+    a `timings` dict to record its stage durations in.
+    """
+
+    def __init__(self, preprocess_fn, workers=None, mode='process',
+                 output_shape=(1, 3, 224, 224), dtype=np.float32):
+        if mode not in ('process', 'thread'):
+            raise ValueError(f"Unknown preprocess pool mode: {mode}")
+        self.preprocess_fn = preprocess_fn
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.mode = mode
+        self.output_shape = tuple(output_shape)
+        self.dtype = np.dtype(dtype)
+        self.slot_bytes = int(np.prod(self.output_shape)) * self.dtype.itemsize
+        self.executor = None
+        self.segment = None
+        self._free_slots = None
+
+    def start(self):
+        """Create the executor (and shared memory); call from the event loop."""
+        if self.workers <= 0:
+            return
+        if self.mode == 'thread':
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        else:
+            # Two slots per worker lets the next job be queued while the
+            # previous result is still being copied out
+            slots = self.workers * 2
+            self.segment = shared_memory.SharedMemory(create=True, size=slots * self.slot_bytes)
+            self._free_slots = asyncio.Queue()
+            for slot in range(slots):
+                self._free_slots.put_nowait(slot)
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        print(f"Started {self.mode} preprocessing pool with {self.workers} workers")
+
+    async def run(self, image_bytes, timings=None):
+        """Preprocess image bytes and return the model input array.
+
+        When a `timings` dict is given, preprocess_fn's stage durations are
+        added to it. `image_bytes` may be any bytes-like object; inline and
+        thread mode decode straight from it.
+        """
+        preprocess_fn = self.preprocess_fn
+        if timings is not None:
+            preprocess_fn = functools.partial(preprocess_fn, timings=timings)
+        if self.executor is None:
+            return preprocess_fn(image_bytes)
+
+        loop = asyncio.get_running_loop()
+        if self.mode == 'thread':
+            return await loop.run_in_executor(self.executor, preprocess_fn, image_bytes)
+
+        if isinstance(image_bytes, memoryview):
+            # Worker processes get the bytes pickled, which a view can't be
+            image_bytes = image_bytes.tobytes()
+        slot = await self._free_slots.get()
+        job = self.executor.submit(
+            _preprocess_into_slot,
+            self.preprocess_fn,
+            image_bytes,
+            self.segment.name,
+            slot,
+            self.output_shape,
+            self.dtype.str,
+            timings is not None
+        )
+        try:
+            # Cancelling this wait cancels the job only if it hasn't started
+            worker_timings = await asyncio.wrap_future(job)
+            if worker_timings:
+                timings.update(worker_timings)
+            view = np.ndarray(
+                self.output_shape,
+                dtype=self.dtype,
+                buffer=self.segment.buf,
+                offset=slot * self.slot_bytes
+            )
+            # Copy out so the slot can be reused while the request continues
+            return view.copy()
+        finally:
+            if job.done():
+                self._free_slots.put_nowait(slot)
+            else:
+                # The caller went away (deadline, shutdown) while a worker is
+                # still writing into the slot: free it once the worker is done
+                job.add_done_callback(functools.partial(self._release_slot, loop, slot))
+
+    def _release_slot(self, loop, slot, job):
+        # Runs on the executor's thread
+        try:
+            loop.call_soon_threadsafe(self._free_slots.put_nowait, slot)
+        except RuntimeError:
+            # Event loop already closed at shutdown
+            pass
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        if self.segment is not None:
+            self.segment.close()
+            self.segment.unlink()
+            self.segment = None
@@ -0,0 +1,154 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+# Refuse to decode anything larger than this many pixels (~50 MP). The header
+# is read first, so oversized uploads are rejected before any pixel memory
+# is allocated.
+MAX_IMAGE_PIXELS = 50_000_000
+
+
+class BufferFile(io.RawIOBase):
+    """Read-only file over any bytes-like object, without copying it.
+
+    io.BytesIO shares a bytes object but copies anything else, such as a
+    memoryview of a received WebSocket message; this hands the decoder only
+    the chunks it reads.
+    """
+
+    def __init__(self, buffer):
+        self._buffer = memoryview(buffer).cast('B')
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        end = len(self._buffer) if size is None or size < 0 else min(len(self._buffer), self._position + size)
+        chunk = self._buffer[self._position:end].tobytes()
+        self._position = max(self._position, end)
+        return chunk
+
+    def readinto(self, b):
+        chunk = self.read(len(b))
+        b[:len(chunk)] = chunk
+        return len(chunk)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._buffer)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+
+def open_image(image_bytes, max_pixels=MAX_IMAGE_PIXELS):
+    """Open image bytes without decoding them, refusing images over `max_pixels`."""
+    image = Image.open(
+        io.BytesIO(image_bytes) if isinstance(image_bytes, bytes) else BufferFile(image_bytes)
+    )
+    width, height = image.size
+    if width * height > max_pixels:
+        raise ValueError(
+            f"Image of {width}x{height} exceeds the {max_pixels} pixel budget"
+        )
+    return image
+
+
+def reduce_image(image, size):
+    """Cheaply scale an image down to RGB, keeping both sides at least `size`.
+
+    A JPEG not decoded yet is decoded with libjpeg's DCT-domain scaling (1/2,
+    1/4 or 1/8), at the smallest scale that still covers `size`, so a 12 MP
+    photo never exists as a full-resolution bitmap. Anything else is
+    box-reduced by an integer factor.
+    """
+    # No-op for other formats and for images already decoded
+    image.draft('RGB', size)
+    image = image.convert('RGB')
+
+    factor = min(image.width // size[0], image.height // size[1])
+    if factor >= 2:
+        image = image.reduce(factor)
+    return image
+
+
+def decode_image(image_bytes, size=(224, 224), max_pixels=MAX_IMAGE_PIXELS):
+    """Decode image bytes straight to an RGB image of `size`, via reduce_image()."""
+    return reduce_image(open_image(image_bytes, max_pixels), size).resize(size)
+
+
+def resize_center_crop(image, resize=256, crop=224):
+    """Resize the shorter side to `resize`, then crop the centre `crop` square.
+
+    Matches torchvision's Resize(resize) + CenterCrop(crop) on PIL images.
+    """
+    width, height = image.size
+    if width <= height:
+        size = (resize, int(resize * height / width))
+    else:
+        size = (int(resize * width / height), resize)
+    if size != image.size:
+        image = image.resize(size, Image.BILINEAR)
+    left = int(round((size[0] - crop) / 2.0))
+    top = int(round((size[1] - crop) / 2.0))
+    return image.crop((left, top, left + crop, top + crop))
+
+
+class Normalization:
+    """Per-channel (pixel * scale - mean) / std, for one model's input.
+
+    The scale, mean and std are folded into a gain and a bias per channel, so
+    apply() converts an HWC uint8 image into a CHW float32 output buffer with
+    one multiply (plus one add when any mean is non-zero) per channel, writing
+    straight into the buffer without intermediate arrays.
+    """
+
+    def __init__(self, scale=1 / 255.0, mean=(0.0, 0.0, 0.0), std=(1.0, 1.0, 1.0)):
+        self.scale = float(scale)
+        self.mean = tuple(float(value) for value in mean)
+        self.std = tuple(float(value) for value in std)
+        self.gain = [np.float32(self.scale / std) for std in self.std]
+        self.bias = [np.float32(-mean / std) for mean, std in zip(self.mean, self.std)]
+
+    @classmethod
+    def from_config(cls, config):
+        """Build from a {'scale', 'mean', 'std'} dict; missing keys use the defaults."""
+        if isinstance(config, cls):
+            return config
+        return cls(**(config or {}))
+
+    def key(self):
+        return (self.scale, self.mean, self.std)
+
+    def apply(self, image, out):
+        """Write normalized `image` (HWC uint8) into `out` (CHW or 1xCHW float32).
+
+        `out` may be a slot of a larger batch buffer, e.g. batch[i].
+        """
+        pixels = np.asarray(image)
+        if out.ndim == 4:
+            out = out[0]
+        for channel, (gain, bias) in enumerate(zip(self.gain, self.bias)):
+            np.multiply(pixels[:, :, channel], gain, out=out[channel])
+            if bias:
+                np.add(out[channel], bias, out=out[channel])
+        return out
+
+
+# Pixels scaled to [0, 1], as the server has always sent them
+DEFAULT_NORMALIZATION = Normalization()
+
+# Unscaled 0-255 pixel values, for models that normalize inside Triton
+PIXEL_VALUES = Normalization(scale=1.0)
+
+# torchvision's ImageNet statistics
+IMAGENET_NORMALIZATION = Normalization(
+    mean=(0.485, 0.456, 0.406),
+    std=(0.229, 0.224, 0.225)
+)
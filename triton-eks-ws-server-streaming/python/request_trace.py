@@ -0,0 +1,57 @@
+import contextvars
+import time
+import uuid
+from contextlib import contextmanager
+
+# Trace of the request being handled by the current task, if it asked for one
+_current_trace = contextvars.ContextVar('request_trace', default=None)
+
+
+class RequestTrace:
+    """Where one request's time went, stage by stage.
+
+    The trace is bound to the handling task with start_trace(); code on the
+    request path times itself with `traced(stage)` without the trace being
+    passed around. Tasks started from that path (asyncio.gather fan-out)
+    inherit the binding and add to the same trace.
+    """
+
+    def __init__(self, trace_id=None):
+        self.trace_id = str(trace_id) if trace_id else uuid.uuid4().hex
+        self.started = time.monotonic()
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'total_ms': round((time.monotonic() - self.started) * 1000, 3),
+            'stages_ms': {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()}
+        }
+
+
+def start_trace(trace_id=None):
+    """Create a trace and bind it to the current task."""
+    trace = RequestTrace(trace_id)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def traced(stage):
+    """Add the block's duration to the current request's trace, if any."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        trace.add(stage, time.monotonic() - start)
@@ -0,0 +1,86 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def content_hash(array):
+    """Digest of an input tensor's dtype, shape and contents."""
+    array = np.ascontiguousarray(array)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{array.dtype.str}{array.shape}".encode('ascii'))
+    digest.update(memoryview(array).cast('B'))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Byte-bounded LRU of model outputs keyed by input content, model and version.
+
+    Identical inputs (the same image under different S3 keys, repeated video
+    frames) map to the same content hash, so their outputs are served without
+    calling Triton. Entries expire after `ttl` seconds; `invalidate_model()`
+    drops every entry for a model, e.g. when Triton loads a new version.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, ttl=300.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # (content hash, model name, model version) -> (expires at, outputs, nbytes)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, input_hash, model_name, model_version):
+        key = (input_hash, model_name, str(model_version))
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, input_hash, model_name, model_version, outputs):
+        # Copy so a cached row doesn't keep a whole batched response alive
+        stored = {}
+        for name, output in outputs.items():
+            output = np.array(output, copy=True)
+            output.setflags(write=False)
+            stored[name] = output
+        nbytes = sum(output.nbytes for output in stored.values())
+        if nbytes > self.max_bytes:
+            return
+
+        key = (input_hash, model_name, str(model_version))
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, stored, nbytes)
+        self._bytes += nbytes
+        while self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate_model(self, model_name=None):
+        """Drop entries for one model, or for every model."""
+        for key in [key for key in self._entries if model_name is None or key[1] == model_name]:
+            self._remove(key)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self._bytes
+        }
+
+    def _remove(self, key):
+        _, _, nbytes = self._entries.pop(key)
+        self._bytes -= nbytes
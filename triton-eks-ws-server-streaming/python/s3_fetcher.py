@@ -0,0 +1,129 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+
+class S3Object:
+    """Bytes and validators of a fetched S3 object."""
+
+    def __init__(self, body, etag, size, not_modified=False):
+        self.body = body
+        self.etag = etag
+        self.size = size
+        # True when an If-None-Match fetch matched; body is None in that case
+        self.not_modified = not_modified
+
+
+class S3Fetcher:
+    """S3 GETs over a shared, sized connection pool, usable from asyncio.
+
+    Every fetch starts with a single ranged GET for the first `part_size`
+    bytes, which doubles as the existence and access check (no HEAD). Larger
+    objects are read as concurrent ranged GETs pinned to the first part's
+    ETag. Passing `if_none_match` makes the GET conditional so an unchanged
+    object costs one round trip and no body transfer.
+
+    boto3 calls run on a dedicated thread pool as large as the connection
+    pool, so `fetch()` never blocks the event loop; `get()` is the same
+    fetch for synchronous callers.
+    """
+
+    def __init__(self, max_connections=64, part_size=8 * 1024 * 1024, max_concurrent_parts=8,
+                 s3_client=None):
+        self.part_size = part_size
+        self.max_concurrent_parts = max_concurrent_parts
+        self.s3_client = s3_client or boto3.client('s3', config=Config(
+            max_pool_connections=max_connections,
+            tcp_keepalive=True,
+            retries={'max_attempts': 3, 'mode': 'adaptive'}
+        ))
+        self.executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix='s3-fetch')
+
+    def _get_object(self, bucket, key, start=None, end=None, if_none_match=None, if_match=None):
+        params = {'Bucket': bucket, 'Key': key}
+        if start is not None:
+            params['Range'] = f"bytes={start}-{end}"
+        if if_none_match:
+            params['IfNoneMatch'] = if_none_match
+        if if_match:
+            params['IfMatch'] = if_match
+        try:
+            response = self.s3_client.get_object(**params)
+        except ClientError as e:
+            status = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+            if status == 304:
+                return None
+            if e.response.get('Error', {}).get('Code') == 'InvalidRange':
+                # Zero-length objects reject any range; fetch them whole
+                return self._get_object(bucket, key, if_none_match=if_none_match, if_match=if_match)
+            raise
+        response['Body'] = response['Body'].read()
+        return response
+
+    def _first_part(self, bucket, key, if_none_match):
+        response = self._get_object(bucket, key, 0, self.part_size - 1, if_none_match=if_none_match)
+        if response is None:
+            return None, None, None
+        etag = response.get('ETag')
+        content_range = response.get('ContentRange')
+        size = int(content_range.rsplit('/', 1)[1]) if content_range else len(response['Body'])
+        return response['Body'], etag, size
+
+    def _remaining_ranges(self, size):
+        return [
+            (start, min(start + self.part_size, size) - 1)
+            for start in range(self.part_size, size, self.part_size)
+        ]
+
+    def get(self, bucket, key, if_none_match=None):
+        """Fetch an object synchronously."""
+        body, etag, size = self._first_part(bucket, key, if_none_match)
+        if body is None:
+            return S3Object(None, if_none_match, None, not_modified=True)
+
+        ranges = self._remaining_ranges(size)
+        if ranges:
+            parts = self.executor.map(
+                lambda r: self._get_object(bucket, key, r[0], r[1], if_match=etag)['Body'],
+                ranges
+            )
+            body = b''.join([body, *parts])
+        return S3Object(body, etag, size)
+
+    async def fetch(self, bucket, key, if_none_match=None, timeout=None):
+        """Fetch an object without blocking the event loop.
+
+        With `timeout` (seconds), raises asyncio.TimeoutError once it runs
+        out; parts that have not started by then are never requested.
+        """
+        return await asyncio.wait_for(self._fetch(bucket, key, if_none_match), timeout)
+
+    async def _fetch(self, bucket, key, if_none_match):
+        loop = asyncio.get_running_loop()
+        body, etag, size = await loop.run_in_executor(
+            self.executor, self._first_part, bucket, key, if_none_match
+        )
+        if body is None:
+            return S3Object(None, if_none_match, None, not_modified=True)
+
+        ranges = self._remaining_ranges(size)
+        if ranges:
+            semaphore = asyncio.Semaphore(self.max_concurrent_parts)
+
+            async def fetch_part(start, end):
+                async with semaphore:
+                    response = await loop.run_in_executor(
+                        self.executor,
+                        lambda: self._get_object(bucket, key, start, end, if_match=etag)
+                    )
+                    return response['Body']
+
+            parts = await asyncio.gather(*(fetch_part(start, end) for start, end in ranges))
+            body = b''.join([body, *parts])
+        return S3Object(body, etag, size)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
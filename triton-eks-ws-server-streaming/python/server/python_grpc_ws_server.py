@@ -1,188 +0,0 @@
-import socket
-from contextlib import closing
-import asyncio
-import websockets
-import json
-import boto3
-import io
-from PIL import Image
-import numpy as np
-import tritonclient.grpc as grpcclient
-from tritonclient.utils import np_to_triton_dtype
-
-def preprocess_image(image_bytes):
-    """Preprocess image for both models."""
-    image = Image.open(io.BytesIO(image_bytes))
-    print(f"Original image size: {image.size}")
-    
-    # Resize to model input size
-    image = image.resize((224, 224))
-    print(f"Resized image size: {image.size}")
-    
-    # Convert to RGB if not already
-    image = image.convert('RGB')
-    
-    # Convert to numpy array and normalize
-    image_array = np.array(image)
-    
-    # Transpose from HWC to CHW format
-    image_array = np.transpose(image_array, (2, 0, 1))
-    
-    # Add batch dimension and convert to float32
-    image_array = np.expand_dims(image_array, axis=0).astype(np.float32)
-    print(f"Final array shape: {image_array.shape}")
-    
-    # Normalize to [0, 1]
-    image_array = image_array / 255.0
-    
-    return image_array
-
-class TritonWebSocketServer:
-    def __init__(self, triton_url="localhost:8001", websocket_port=None):
-        self.triton_url = triton_url
-        self.websocket_port = websocket_port if websocket_port else self._find_available_port()
-        self.triton_client = grpcclient.InferenceServerClient(url=triton_url)
-        self.s3_client = boto3.client('s3')
-        print(f"Initialized Triton gRPC client with URL: {triton_url}")
-
-    async def run_model_inference(self, model_name, input_data):
-        """Run inference for a single model using gRPC."""
-        print(f"\nRunning inference for model: {model_name}")
-        try:
-            # Get model metadata
-            model_metadata = self.triton_client.get_model_metadata(model_name)
-            model_config = self.triton_client.get_model_config(model_name)
-            
-            # Create the input tensor
-            input_name = model_metadata.inputs[0].name
-            input_shape = input_data.shape
-            input_datatype = np_to_triton_dtype(input_data.dtype)
-
-            inputs = []
-            inputs.append(grpcclient.InferInput(input_name, input_shape, input_datatype))
-            inputs[0].set_data_from_numpy(input_data)
-
-            # Create the output tensors
-            outputs = []
-            for output in model_metadata.outputs:
-                outputs.append(grpcclient.InferRequestedOutput(output.name))
-
-            # Run inference
-            response = self.triton_client.infer(
-                model_name=model_name,
-                inputs=inputs,
-                outputs=outputs
-            )
-            print(f"Inference completed for {model_name}")
-            return response
-
-        except Exception as e:
-            print(f"Error during {model_name} inference: {str(e)}")
-            raise
-
-    async def handle_inference(self, websocket):
-        try:
-            async for message in websocket:
-                print("\n--- Starting parallel model inference request ---")
-                try:
-                    request_data = json.loads(message)
-                except json.JSONDecodeError as e:
-                    print(f"Error decoding JSON: {str(e)}")
-                    print(f"Received message: {message}")
-                    raise
-                
-                print(f"Received request data: {request_data}")
-                
-                try:
-                    s3_bucket = request_data['bucket']
-                    s3_key = request_data['key']
-                except KeyError as e:
-                    print(f"Missing required field: {str(e)}")
-                    raise ValueError(f"Request missing required field: {str(e)}")
-                
-                print(f"Loading image from s3://{s3_bucket}/{s3_key}")
-
-                # Get image from S3
-                try:
-                    response = self.s3_client.get_object(Bucket=s3_bucket, Key=s3_key)
-                    image_bytes = response['Body'].read()
-                    print("Successfully loaded image from S3")
-                except Exception as e:
-                    print(f"Error loading from S3: {str(e)}")
-                    raise
-                
-                # Preprocess image
-                input_data = preprocess_image(image_bytes)
-                print(f"Preprocessed input shape: {input_data.shape}")
-                
-                try:
-                    # Run inference for both models
-                    densenet_response = await self.run_model_inference('densenet_onnx', input_data)
-                    resnet_response = await self.run_model_inference('resnet50_onnx', input_data)
-                    
-                except Exception as e:
-                    print(f"Error during model inference: {str(e)}")
-                    raise
-                
-                # Process outputs
-                try:
-                    pipeline_outputs = {
-                        'densenet': {},
-                        'resnet': {}
-                    }
-                    
-                    # Process DenseNet outputs
-                    for output in densenet_response.get_response().outputs:
-                        output_name = output.name
-                        output_data = densenet_response.as_numpy(output_name)
-                        pipeline_outputs['densenet'][output_name] = output_data.tolist()
-                    
-                    # Process ResNet outputs
-                    for output in resnet_response.get_response().outputs:
-                        output_name = output.name
-                        output_data = resnet_response.as_numpy(output_name)
-                        pipeline_outputs['resnet'][output_name] = output_data.tolist()
-                    
-                    await websocket.send(json.dumps({
-                        'status': 'success',
-                        'outputs': pipeline_outputs
-                    }))
-                    print("Pipeline response sent to client")
-                except Exception as e:
-                    print(f"Error processing outputs: {str(e)}")
-                    raise
-
-        except Exception as e:
-            error_msg = {'status': 'error', 'message': str(e)}
-            print(f"Server error: {str(e)}")
-            await websocket.send(json.dumps(error_msg))
-
-    async def start_server(self):
-        async with websockets.serve(
-            self.handle_inference, 
-            "0.0.0.0", 
-            self.websocket_port,
-            max_size=1024*1024*1024,
-            max_queue=16
-        ):
-            print(f"WebSocket server started on port {self.websocket_port}")
-            await asyncio.Future()
-
-    def _find_available_port(self):
-        with closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as s:
-            s.bind(('', 0))
-            s.listen(1)
-            port = s.getsockname()[1]
-            return port
-
-    def run(self):
-        asyncio.run(self.start_server())
-
-if __name__ == "__main__":
-    server = TritonWebSocketServer(
-        triton_url="localhost:8001",  # Note: gRPC uses port 8001
-        websocket_port=8080
-    )
-    print("Starting WebSocket server...")
-    server.run()
-
@@ -3,12 +3,13 @@ from contextlib import closing
 import asyncio
 import websockets
 import json
-import boto3
 import io
 from PIL import Image
 import numpy as np
 from tritonclient.utils import *
-import tritonclient.http as httpclient
+import tritonclient.http.aio as httpclient
+from model_cache import ModelMetadataCache
+from s3_fetcher import S3Fetcher
 
 def preprocess_image(image_bytes):
     """Preprocess image for DenseNet model."""
@@ -43,12 +44,15 @@ def preprocess_image(image_bytes):
     return image_array
 
 class TritonWebSocketServer:
-    def __init__(self, triton_url="localhost:8000", websocket_port=None):
+    def __init__(self, triton_url="localhost:8000", websocket_port=None, metadata_ttl=300.0, s3_max_connections=64):
         self.triton_url = triton_url
         self.websocket_port = websocket_port if websocket_port else self._find_available_port()
-        self.triton_client = httpclient.InferenceServerClient(url=triton_url)
-        self.s3_client = boto3.client('s3')
-        print(f"Initialized Triton client with URL: {triton_url}")
+        self.metadata_ttl = metadata_ttl
+        # Created on the server's event loop in start_server()
+        self.triton_client = None
+        self.model_cache = None
+        # S3 GETs run on a pooled client off the event loop
+        self.s3_fetcher = S3Fetcher(max_connections=s3_max_connections)
 
     async def handle_inference(self, websocket):
         try:
@@ -64,8 +68,8 @@ class TritonWebSocketServer:
 
                 # Get image from S3
                 try:
-                    response = self.s3_client.get_object(Bucket=s3_bucket, Key=s3_key)
-                    image_bytes = response['Body'].read()
+                    s3_object = await self.s3_fetcher.fetch(s3_bucket, s3_key)
+                    image_bytes = s3_object.body
                     print("Successfully loaded image from S3")
                 except Exception as e:
                     print(f"Error loading from S3: {str(e)}")
@@ -75,11 +79,9 @@ class TritonWebSocketServer:
                 input_data = preprocess_image(image_bytes)
                 print(f"Preprocessed input shape: {input_data.shape}, dtype: {input_data.dtype}")
 
-                # Get model metadata
+                # Get model metadata (cached, fetched once per model version)
                 try:
-                    model_metadata = self.triton_client.get_model_metadata(model_name)
-                    print("\nModel Metadata:")
-                    print(json.dumps(model_metadata, indent=2))
+                    model_metadata = await self.model_cache.get_metadata(model_name)
                     input_name = model_metadata['inputs'][0]['name']
                     print(f"Using input name: {input_name}")
                 except Exception as e:
@@ -102,7 +104,7 @@ class TritonWebSocketServer:
                 # Run inference
                 try:
                     print("Starting inference...")
-                    response = self.triton_client.infer(
+                    response = await self.triton_client.infer(
                         model_name=model_name,
                         inputs=[input_tensor]
                     )
@@ -150,15 +152,24 @@ class TritonWebSocketServer:
             await websocket.send(json.dumps(error_msg))
 
     async def start_server(self):
-        async with websockets.serve(
-            self.handle_inference, 
-            "localhost", 
-            self.websocket_port,
-            max_size=1024*1024*1024,
-            max_queue=16
-        ):
-            print(f"WebSocket server started on ws://localhost:{self.websocket_port}")
-            await asyncio.Future()
+        self.triton_client = httpclient.InferenceServerClient(url=self.triton_url)
+        print(f"Initialized Triton client with URL: {self.triton_url}")
+        self.model_cache = ModelMetadataCache(self.triton_client, ttl=self.metadata_ttl)
+        watch_task = asyncio.create_task(self.model_cache.watch())
+        try:
+            async with websockets.serve(
+                self.handle_inference, 
+                "localhost", 
+                self.websocket_port,
+                max_size=1024*1024*1024,
+                max_queue=16
+            ):
+                print(f"WebSocket server started on ws://localhost:{self.websocket_port}")
+                await asyncio.Future()
+        finally:
+            watch_task.cancel()
+            self.s3_fetcher.close()
+            await self.triton_client.close()
 
     def _find_available_port(self):
         with closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as s:
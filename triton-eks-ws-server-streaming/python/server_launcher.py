@@ -0,0 +1,194 @@
+"""Run several TritonWebSocketServer processes on one port.
+
+A single server process runs preprocessing hand-off, JSON encoding and the
+WebSocket protocol on one event loop, so it tops out at one core. This
+launcher starts N worker processes that each bind the WebSocket port with
+SO_REUSEPORT (the kernel spreads new connections across them) and each own
+their Triton, S3 and preprocessing resources. A supervisor restarts workers
+that exit and serves the workers' metrics, summed, on the metrics port.
+
+    python3 server_launcher.py --workers 4 --port 8080 --metrics-port 8081 [--transport grpc]
+
+Workers default to WS_WORKERS or the CPU count. The PREPROCESS_WORKERS budget
+(CPU count by default) is split evenly between them. Admission limits
+(max_inflight_requests etc.) apply per worker.
+"""
+import argparse
+import asyncio
+import glob
+import multiprocessing
+import os
+import signal
+import tempfile
+import time
+from multiprocessing.connection import wait
+
+from triton_transport import TRANSPORTS
+
+# A worker that dies sooner than this after starting is restarted with a
+# growing delay, so a crash loop doesn't spin the supervisor
+MIN_UPTIME = 5.0
+MAX_RESTART_DELAY = 30.0
+
+
+async def _serve(server):
+    # SIGTERM cancels the server task, so its cleanup (preprocess pool,
+    # S3 and Triton clients) runs before the worker exits
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    await server.start_server()
+
+
+def run_worker(server_kwargs):
+    # Imported in the worker so prometheus_client sees the supervisor's
+    # PROMETHEUS_MULTIPROC_DIR
+    from pipeline_server import TritonWebSocketServer
+
+    server = TritonWebSocketServer(**server_kwargs)
+    try:
+        asyncio.run(_serve(server))
+    except (asyncio.CancelledError, KeyboardInterrupt):
+        pass
+
+
+class WorkerSupervisor:
+    """Keeps `workers` server processes running until stopped."""
+
+    def __init__(self, workers, server_kwargs, metrics_port=8081):
+        self.workers = workers
+        self.server_kwargs = dict(server_kwargs, metrics_port=None, reuse_port=True)
+        self.metrics_port = metrics_port
+        # spawn rather than fork: workers start from a clean interpreter
+        # instead of a copy of the supervisor
+        self.context = multiprocessing.get_context('spawn')
+        self.processes = [None] * workers
+        self.started = [0.0] * workers
+        self.restart_delay = [0.0] * workers
+        self.restarts = 0
+        self.stopping = False
+
+    def start_worker(self, slot):
+        process = self.context.Process(
+            target=run_worker,
+            args=(self.server_kwargs,),
+            name=f"ws-worker-{slot}"
+        )
+        process.start()
+        self.processes[slot] = process
+        self.started[slot] = time.monotonic()
+        print(f"Started worker {slot} (pid {process.pid})")
+
+    def run(self):
+        # Imported here so the supervisor, too, picks up the multiprocess directory
+        from metrics import mark_worker_dead, start_multiprocess_metrics_server
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        if self.metrics_port:
+            start_multiprocess_metrics_server(self.metrics_port)
+        for slot in range(self.workers):
+            self.start_worker(slot)
+        pending = {}
+        try:
+            while not self.stopping:
+                running = [p.sentinel for p in self.processes if p is not None]
+                wait(running, timeout=0.5)
+                now = time.monotonic()
+                for slot, process in enumerate(self.processes):
+                    if process is not None and process.exitcode is not None:
+                        mark_worker_dead(process.pid)
+                        uptime = now - self.started[slot]
+                        if uptime < MIN_UPTIME:
+                            self.restart_delay[slot] = min(
+                                MAX_RESTART_DELAY, max(1.0, 2 * self.restart_delay[slot]))
+                        else:
+                            self.restart_delay[slot] = 0.0
+                        print(f"Worker {slot} (pid {process.pid}) exited with code {process.exitcode} "
+                              f"after {uptime:.1f}s; restarting in {self.restart_delay[slot]:.1f}s")
+                        self.processes[slot] = None
+                        pending[slot] = now + self.restart_delay[slot]
+                for slot, restart_at in list(pending.items()):
+                    if not self.stopping and now >= restart_at:
+                        del pending[slot]
+                        self.restarts += 1
+                        self.start_worker(slot)
+        finally:
+            self.shutdown()
+            for process in self.processes:
+                if process is not None:
+                    mark_worker_dead(process.pid)
+
+    def shutdown(self, timeout=10.0):
+        running = [p for p in self.processes if p is not None and p.is_alive()]
+        for process in running:
+            process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in running:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                print(f"Worker {process.name} (pid {process.pid}) did not stop; killing it")
+                process.kill()
+                process.join()
+
+    def _stop(self, signum, frame):
+        print(f"Received signal {signum}, stopping workers...")
+        self.stopping = True
+
+
+def prepare_metrics_dir():
+    """Point PROMETHEUS_MULTIPROC_DIR at an empty directory, creating one if unset."""
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        # Samples left over from a previous run would be added to this one's
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            os.remove(path)
+    else:
+        directory = tempfile.mkdtemp(prefix='ws-metrics-')
+        os.environ['PROMETHEUS_MULTIPROC_DIR'] = directory
+    return directory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ.get('WS_WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--transport', default=os.environ.get('TRITON_TRANSPORT', 'http'),
+                        choices=sorted(TRANSPORTS))
+    parser.add_argument('--triton-url', default=None,
+                        help="Triton endpoint (default: the transport's local port)")
+    parser.add_argument('--triton-streams', type=int, default=1,
+                        help='Inference streams per worker with --transport grpc_stream')
+    parser.add_argument('--shared-memory', action='store_true',
+                        default=os.environ.get('TRITON_SHARED_MEMORY') == '1',
+                        help='Exchange tensors with a co-located Triton through system shared memory')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--metrics-port', type=int, default=8081)
+    parser.add_argument('--preprocess-workers', type=int,
+                        default=int(os.environ.get('PREPROCESS_WORKERS', os.cpu_count() or 1)),
+                        help='Preprocessing processes across all workers (0 runs it inline)')
+    args = parser.parse_args()
+
+    workers = max(1, args.workers)
+    preprocess_workers = max(1, args.preprocess_workers // workers) if args.preprocess_workers else 0
+    print(f"Metrics directory: {prepare_metrics_dir()}")
+    print(f"Starting {workers} WebSocket server workers on {args.host}:{args.port} "
+          f"with {preprocess_workers} preprocessing processes each...")
+    supervisor = WorkerSupervisor(
+        workers,
+        dict(
+            triton_url=args.triton_url,
+            transport=args.transport,
+            triton_streams=args.triton_streams,
+            shared_memory=args.shared_memory,
+            websocket_port=args.port,
+            host=args.host,
+            preprocess_workers=preprocess_workers
+        ),
+        metrics_port=args.metrics_port
+    )
+    supervisor.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import os
+from math import prod
+
+import tritonclient.utils.shared_memory as shm
+from tritonclient.utils import triton_to_np_dtype
+
+# Byte alignment of each tensor inside a region
+ALIGNMENT = 64
+
+DATATYPE_SIZES = {
+    'BOOL': 1, 'UINT8': 1, 'INT8': 1, 'UINT16': 2, 'INT16': 2, 'FP16': 2, 'BF16': 2,
+    'UINT32': 4, 'INT32': 4, 'FP32': 4, 'UINT64': 8, 'INT64': 8, 'FP64': 8
+}
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class Placement:
+    """Where one inference's tensors sit in a shared-memory region."""
+
+    def __init__(self, region, input_bytes, outputs):
+        self.region = region
+        self.input_bytes = input_bytes
+        # [(output name, datatype, offset, byte size)], after the input
+        self.outputs = outputs
+
+
+class SharedMemoryPool:
+    """System shared-memory regions registered with a co-located Triton.
+
+    Each region holds one inference at a time: the input tensor at offset 0,
+    followed by space for every output. Tensors are written and read in
+    place, so nothing crosses the socket but the request and response
+    headers. Regions are created and registered once in register() and
+    reused; a request that finds none free, or does not fit in one, is
+    left to go over the socket instead of waiting.
+
+    Only works when Triton shares /dev/shm with the server: the same
+    container, as k8s/start.sh runs them, or a shared volume.
+    """
+
+    def __init__(self, regions=8, region_bytes=8*1024*1024, prefix=None):
+        self.regions = regions
+        self.region_bytes = region_bytes
+        # Per process, so SO_REUSEPORT workers don't collide
+        self.prefix = prefix or f"ws_pipeline_{os.getpid()}"
+        self._handles = {}
+        self._registered = []
+        self._free = []
+        self.used = 0
+        self.fallbacks = 0
+
+    async def register(self, client):
+        """Create the regions and register them with Triton through `client`."""
+        for i in range(self.regions):
+            name = f"{self.prefix}_{i}"
+            key = f"/{name}"
+            # create_only: never take over (and later unlink) someone else's region
+            self._handles[name] = shm.create_shared_memory_region(name, key, self.region_bytes, create_only=True)
+            await client.register_system_shared_memory(name, key, self.region_bytes)
+            self._registered.append(name)
+            self._free.append(name)
+        print(f"Registered {self.regions} shared memory regions of {self.region_bytes} bytes with Triton")
+
+    async def unregister(self, client):
+        """Unregister the regions from Triton and remove them."""
+        for name in self._registered:
+            try:
+                await client.unregister_system_shared_memory(name)
+            except Exception as e:
+                print(f"Error unregistering shared memory region {name}: {str(e)}")
+        for handle in self._handles.values():
+            shm.destroy_shared_memory_region(handle)
+        self._handles.clear()
+        self._registered.clear()
+        self._free.clear()
+
+    def reserve(self, input_data, outputs):
+        """Take a free region laid out for `input_data` and `outputs`, or None.
+
+        `outputs` is the model metadata's output list. A -1 (or '-1' from
+        gRPC JSON) first dimension is the batch, sized like the input's;
+        any other variable dimension is only known once Triton answers, so
+        such outputs go over the socket.
+        """
+        offset = _aligned(input_data.nbytes)
+        placed = []
+        for output in outputs:
+            datatype = output['datatype']
+            if datatype not in DATATYPE_SIZES:
+                return self._fallback()
+            shape = [int(dim) for dim in output['shape']]
+            if shape and shape[0] < 0:
+                shape[0] = input_data.shape[0]
+            if any(dim < 0 for dim in shape):
+                return self._fallback()
+            byte_size = prod(shape) * DATATYPE_SIZES[datatype]
+            placed.append((output['name'], datatype, offset, byte_size))
+            offset = _aligned(offset + byte_size)
+        if offset > self.region_bytes or not self._free:
+            return self._fallback()
+        self.used += 1
+        return Placement(self._free.pop(), input_data.nbytes, placed)
+
+    def release(self, placement):
+        self._free.append(placement.region)
+
+    def write_input(self, placement, input_data):
+        shm.set_shared_memory_region(self._handles[placement.region], [input_data])
+
+    def read_output(self, placement, name, shape):
+        """Copy an output out of the region, so the region can be reused."""
+        for output_name, datatype, offset, _ in placement.outputs:
+            if output_name == name:
+                return shm.get_contents_as_numpy(
+                    self._handles[placement.region], triton_to_np_dtype(datatype), shape, offset
+                ).copy()
+        raise KeyError(f"No shared memory placed for output {name}")
+
+    def stats(self):
+        return {
+            'regions': len(self._handles),
+            'free': len(self._free),
+            'used': self.used,
+            'fallbacks': self.fallbacks
+        }
+
+    def _fallback(self):
+        self.fallbacks += 1
+        return None
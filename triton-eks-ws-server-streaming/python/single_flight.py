@@ -0,0 +1,55 @@
+import asyncio
+
+
+class SingleFlight:
+    """Shares one in-progress call among concurrent callers with the same key.
+
+    The first caller for a key starts the call; callers that arrive while it
+    is still running wait on the same future and get the same result (or
+    exception). Nothing is kept once the call finishes, so later callers
+    start a fresh one.
+
+    Callers may pass the deadline their `call` runs with (None for none).
+    A caller only joins a call whose deadline is no earlier than its own,
+    so every call runs with the latest deadline of the callers sharing it;
+    a caller that would outlive the call in flight starts its own, which
+    later callers join instead.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        # Calls actually started, and callers that attached to one instead
+        self.calls = 0
+        self.coalesced = 0
+
+    async def run(self, key, call, deadline=None):
+        """Await `call()` for `key`, or the call already in flight for it."""
+        if self.in_flight(key, deadline):
+            pending = self._pending[key][0]
+            self.coalesced += 1
+            print(f"Coalesced request for {key} ({self.coalesced} coalesced, {self.calls} calls so far)")
+        else:
+            self.calls += 1
+            pending = asyncio.ensure_future(call())
+            self._pending[key] = (pending, deadline)
+            pending.add_done_callback(lambda _: self._forget(key, pending))
+        # Shielded so one caller going away does not cancel the call for the rest
+        return await asyncio.shield(pending)
+
+    def in_flight(self, key, deadline=None):
+        """Whether run() with `deadline` would join a call already running for `key`."""
+        if key not in self._pending:
+            return False
+        call_deadline = self._pending[key][1]
+        return call_deadline is None or (deadline is not None and call_deadline >= deadline)
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._pending)
+        }
+
+    def _forget(self, key, pending):
+        if self._pending.get(key, (None,))[0] is pending:
+            del self._pending[key]
@@ -0,0 +1,233 @@
+import asyncio
+import hashlib
+import itertools
+import os
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class TensorCache:
+    """Byte-bounded LRU of preprocessed input tensors keyed by S3 bucket/key/ETag.
+
+    `lookup()` returns the tensor cached for the object's latest known ETag,
+    plus whether that ETag was confirmed within the last `revalidate_after`
+    seconds. A fresh entry can be used without touching S3 at all; a stale
+    one should be revalidated with a conditional GET (If-None-Match) and
+    either `confirm()`ed on 304 or replaced with `put()`.
+
+    When `spill_dir` is set, entries evicted from memory are written there as
+    .npy files, up to `max_spill_bytes`, and promoted back on a hit. Spill
+    files are written, read and removed on the default executor, so the
+    cache must be used from the event loop.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024, revalidate_after=30.0, spill_dir=None,
+                 max_spill_bytes=4 * 1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.spill_dir = spill_dir
+        self.max_spill_bytes = max_spill_bytes
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+        # (bucket, key, etag) -> tensor, least recently used first
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # (bucket, key, etag) -> (path, nbytes), least recently used first
+        self._spilled = OrderedDict()
+        self._spilled_bytes = 0
+        # (bucket, key, etag) -> (tensor, write future) while being spilled
+        self._spilling = {}
+        # (bucket, key, etag) -> read future while being promoted from disk
+        self._loading = {}
+        self._spill_ids = itertools.count()
+        # (bucket, key) -> (etag, monotonic time the etag was last confirmed)
+        self._etags = {}
+        self.hits = 0
+        self.misses = 0
+        self.spill_hits = 0
+        self.evictions = 0
+
+    async def lookup(self, bucket, key):
+        """Return (etag, tensor, fresh) for the object, or None on a miss."""
+        known = self._etags.get((bucket, key))
+        if known is None:
+            self.misses += 1
+            return None
+        etag, confirmed_at = known
+        entry_key = (bucket, key, etag)
+
+        tensor = self._entries.get(entry_key)
+        if tensor is not None:
+            self._entries.move_to_end(entry_key)
+        else:
+            spilling = self._spilling.pop(entry_key, None)
+            if spilling is not None:
+                # Still in memory; the file is dropped once written
+                tensor = spilling[0]
+                self.spill_hits += 1
+                self._store(entry_key, tensor)
+            else:
+                # Promoted once the read finishes
+                tensor = await self._load_spilled(entry_key)
+            if tensor is None:
+                self._forget(entry_key)
+                self.misses += 1
+                return None
+
+        self.hits += 1
+        fresh = time.monotonic() - confirmed_at < self.revalidate_after
+        return etag, tensor, fresh
+
+    def confirm(self, bucket, key, etag):
+        """Record that S3 reported the cached ETag is still current."""
+        self._etags[(bucket, key)] = (etag, time.monotonic())
+
+    def put(self, bucket, key, etag, tensor):
+        """Cache the tensor preprocessed from the object version `etag`."""
+        previous = self._etags.get((bucket, key))
+        if previous is not None and previous[0] != etag:
+            self._discard((bucket, key, previous[0]))
+
+        tensor = np.ascontiguousarray(tensor)
+        tensor.setflags(write=False)
+        self._etags[(bucket, key)] = (etag, time.monotonic())
+        self._store((bucket, key, etag), tensor)
+        return tensor
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'spill_hits': self.spill_hits,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'spilled_entries': len(self._spilled),
+            'spilled_bytes': self._spilled_bytes
+        }
+
+    def _store(self, entry_key, tensor):
+        if tensor.nbytes > self.max_bytes:
+            return
+        old = self._entries.pop(entry_key, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+        self._entries[entry_key] = tensor
+        self._bytes += tensor.nbytes
+
+        while self._bytes > self.max_bytes:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+            if not (self.spill_dir and self._spill(evicted_key, evicted)):
+                self._forget(evicted_key)
+
+    def _forget(self, entry_key):
+        # Drop the ETag record if it still points at this entry
+        if self._etags.get(entry_key[:2], (None,))[0] == entry_key[2]:
+            del self._etags[entry_key[:2]]
+
+    def _discard(self, entry_key):
+        tensor = self._entries.pop(entry_key, None)
+        if tensor is not None:
+            self._bytes -= tensor.nbytes
+        self._spilling.pop(entry_key, None)
+        self._loading.pop(entry_key, None)
+        spilled = self._spilled.pop(entry_key, None)
+        if spilled is not None:
+            self._remove_spill_file(*spilled)
+
+    def _spill_path(self, entry_key):
+        digest = hashlib.sha1('\0'.join(entry_key).encode('utf-8')).hexdigest()
+        # Unique per write, so an entry spilled again never shares a file
+        return os.path.join(self.spill_dir, f"{digest}-{next(self._spill_ids)}.npy")
+
+    def _spill(self, entry_key, tensor):
+        """Start writing an evicted entry to disk; returns False if it can't be spilled."""
+        if tensor.nbytes > self.max_spill_bytes:
+            return False
+        path = self._spill_path(entry_key)
+        write = asyncio.get_running_loop().run_in_executor(None, np.save, path, tensor)
+        self._spilling[entry_key] = (tensor, write)
+        write.add_done_callback(lambda _: self._spill_written(entry_key, path, tensor.nbytes, write))
+        return True
+
+    def _spill_written(self, entry_key, path, nbytes, write):
+        current = self._spilling.get(entry_key, (None, None))[1] is write
+        if current:
+            del self._spilling[entry_key]
+        error = write.exception()
+        if error is not None:
+            print(f"Error spilling tensor cache entry to disk: {str(error)}")
+            if current:
+                self._forget(entry_key)
+            self._remove_file(path)
+            return
+        if not current:
+            # Promoted back to memory or discarded while being written
+            self._remove_file(path)
+            return
+        self._spilled[entry_key] = (path, nbytes)
+        self._spilled_bytes += nbytes
+
+        while self._spilled_bytes > self.max_spill_bytes:
+            dropped_key, dropped = self._spilled.popitem(last=False)
+            self._remove_spill_file(*dropped)
+            self._forget(dropped_key)
+
+    async def _load_spilled(self, entry_key):
+        """Read a spilled entry back; concurrent lookups share one read."""
+        loading = self._loading.get(entry_key)
+        if loading is None:
+            spilled = self._spilled.pop(entry_key, None)
+            if spilled is None:
+                return None
+            path, nbytes = spilled
+            self._spilled_bytes -= nbytes
+            loading = asyncio.get_running_loop().run_in_executor(None, _read_spill_file, path)
+            self._loading[entry_key] = loading
+            loading.add_done_callback(lambda _: self._spill_loaded(entry_key, loading))
+        try:
+            # Shielded so a cancelled lookup leaves the read to the others
+            return await asyncio.shield(loading)
+        except (OSError, ValueError, EOFError):
+            # Missing or truncated file: a miss
+            return None
+
+    def _spill_loaded(self, entry_key, loading):
+        # Runs before the lookups waiting on the read resume
+        if self._loading.get(entry_key) is not loading:
+            # Discarded while being read
+            return
+        del self._loading[entry_key]
+        if loading.cancelled() or loading.exception() is not None:
+            self._forget(entry_key)
+            return
+        tensor = loading.result()
+        tensor.setflags(write=False)
+        self.spill_hits += 1
+        self._store(entry_key, tensor)
+
+    def _remove_spill_file(self, path, nbytes):
+        self._spilled_bytes -= nbytes
+        self._remove_file(path)
+
+    def _remove_file(self, path):
+        asyncio.get_running_loop().run_in_executor(None, _remove_file, path)
+
+
+def _read_spill_file(path):
+    # Promoted entries live in memory again, so the file goes either way
+    try:
+        return np.load(path)
+    finally:
+        _remove_file(path)
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
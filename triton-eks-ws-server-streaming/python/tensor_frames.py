@@ -0,0 +1,136 @@
+"""Binary WebSocket frames: a small JSON header plus raw bytes.
+
+Response frame layout:
+
+    uint32 (little-endian)  header length in bytes
+    header                  UTF-8 JSON
+    padding                 up to the next 8-byte boundary
+    tensor data             little-endian tensor bytes, each 8-byte aligned
+
+The header is the same message the JSON format sends, except every tensor
+under "outputs" (at any depth) is replaced by {"dtype", "shape", "offset",
+"nbytes"}, with the offset counted from the start of the tensor data.
+decode_tensor_frame() swaps those descriptors back for read-only numpy views
+over the frame, without copying.
+
+Clients opt in per connection by offering BINARY_SUBPROTOCOL during the
+WebSocket handshake; connections without it keep receiving JSON text.
+
+Requests may be binary too, on any connection, to send the image itself
+instead of an S3 location:
+
+    uint32 (little-endian)  header length in bytes
+    header                  UTF-8 JSON: the JSON request's options, without
+                            "bucket" and "key"
+    image                   encoded image bytes (JPEG, PNG, ...)
+
+image_frame_fragments() splits a request into WebSocket fragments, so a
+large image goes out as one fragmented message instead of one huge frame;
+decode_image_frame() returns the image as a view over the received message.
+"""
+import json
+import struct
+
+import numpy as np
+
+BINARY_SUBPROTOCOL = 'triton-tensor-frames.v1'
+
+ALIGNMENT = 8
+_HEADER_LENGTH = struct.Struct('<I')
+_DESCRIPTOR_KEYS = {'dtype', 'shape', 'offset', 'nbytes'}
+
+
+def _aligned(size):
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def encode_tensor_frame(header, outputs):
+    """Encode header plus nested {name: ndarray or dict} outputs as one frame."""
+    chunks = []
+    offset = 0
+
+    def describe(value):
+        nonlocal offset
+        if isinstance(value, dict):
+            return {name: describe(item) for name, item in value.items()}
+        array = np.ascontiguousarray(value)
+        array = array.astype(array.dtype.newbyteorder('<'), copy=False)
+        descriptor = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': offset,
+            'nbytes': array.nbytes
+        }
+        padding = _aligned(array.nbytes) - array.nbytes
+        chunks.append(memoryview(array).cast('B'))
+        if padding:
+            chunks.append(bytes(padding))
+        offset += array.nbytes + padding
+        return descriptor
+
+    header_bytes = json.dumps(dict(header, outputs=describe(outputs))).encode('utf-8')
+    prefix_size = _HEADER_LENGTH.size + len(header_bytes)
+    return b''.join([
+        _HEADER_LENGTH.pack(len(header_bytes)),
+        header_bytes,
+        bytes(_aligned(prefix_size) - prefix_size),
+        *chunks
+    ])
+
+
+def decode_tensor_frame(frame):
+    """Decode a frame into its header with outputs as zero-copy numpy arrays."""
+    (header_length,) = _HEADER_LENGTH.unpack_from(frame, 0)
+    header_end = _HEADER_LENGTH.size + header_length
+    header = json.loads(bytes(frame[_HEADER_LENGTH.size:header_end]))
+    data_start = _aligned(header_end)
+
+    def restore(value):
+        if value.keys() != _DESCRIPTOR_KEYS:
+            return {name: restore(item) for name, item in value.items()}
+        dtype = np.dtype(value['dtype'])
+        return np.frombuffer(
+            frame,
+            dtype=dtype,
+            count=value['nbytes'] // dtype.itemsize,
+            offset=data_start + value['offset']
+        ).reshape(value['shape'])
+
+    header['outputs'] = restore(header.get('outputs', {}))
+    return header
+
+
+# Fragment size for image requests; the server reassembles them into one message
+IMAGE_FRAGMENT_BYTES = 256 * 1024
+
+
+def encode_image_frame(header, image_bytes):
+    """Encode a request header plus encoded image bytes as one frame."""
+    return b''.join(image_frame_fragments(header, image_bytes))
+
+
+def image_frame_fragments(header, image_bytes, fragment_bytes=IMAGE_FRAGMENT_BYTES):
+    """Split an image request frame into fragments, for `await websocket.send(fragments)`."""
+    header_bytes = json.dumps(header).encode('utf-8')
+    image = memoryview(image_bytes).cast('B')
+    fragments = [_HEADER_LENGTH.pack(len(header_bytes)) + header_bytes]
+    for start in range(0, len(image), fragment_bytes):
+        fragments.append(image[start:start + fragment_bytes])
+    return fragments
+
+
+def decode_image_frame(frame):
+    """Decode an image request frame into its header and a zero-copy view of the image."""
+    if len(frame) < _HEADER_LENGTH.size:
+        raise ValueError("Image frame is too short for its header length")
+    (header_length,) = _HEADER_LENGTH.unpack_from(frame, 0)
+    header_end = _HEADER_LENGTH.size + header_length
+    if header_end > len(frame):
+        raise ValueError("Image frame is shorter than its header length")
+    header = json.loads(bytes(frame[_HEADER_LENGTH.size:header_end]))
+    if not isinstance(header, dict):
+        raise ValueError("Image frame header must be a JSON object")
+    image = memoryview(frame)[header_end:]
+    if not image:
+        raise ValueError("Image frame has no image data")
+    return header, image
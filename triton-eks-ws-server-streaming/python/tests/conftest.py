@@ -0,0 +1,137 @@
+"""Shared helpers: an in-memory S3 client and a pipeline server on a fake Triton.
+
+Run from triton-eks-ws-server-streaming/python:
+
+    python -m pytest tests
+"""
+import asyncio
+import io
+import json
+import os
+import socket
+import sys
+import time
+from contextlib import asynccontextmanager, closing
+
+import websockets
+from botocore.exceptions import ClientError
+from PIL import Image
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PYTHON_DIR)
+sys.path.insert(0, os.path.join(PYTHON_DIR, 'benchmarks'))
+
+import fake_triton  # noqa: E402
+from pipeline_server import TritonWebSocketServer  # noqa: E402
+
+
+def client_error(code, status):
+    return ClientError({'Error': {'Code': code}, 'ResponseMetadata': {'HTTPStatusCode': status}}, 'GetObject')
+
+
+class StubS3:
+    """get_object() over in-memory {key: (body, etag)}, answering ranges and conditions like S3."""
+
+    def __init__(self, objects, delay=0.0):
+        self.objects = objects
+        # Seconds every GET takes, on the fetcher's thread
+        self.delay = delay
+        self.calls = []
+
+    def get_object(self, Bucket, Key, Range=None, IfNoneMatch=None, IfMatch=None):
+        self.calls.append({'Key': Key, 'Range': Range, 'IfNoneMatch': IfNoneMatch, 'IfMatch': IfMatch})
+        if self.delay:
+            time.sleep(self.delay)
+        if Key not in self.objects:
+            raise client_error('NoSuchKey', 404)
+        body, etag = self.objects[Key]
+        if IfMatch is not None and IfMatch != etag:
+            raise client_error('PreconditionFailed', 412)
+        if IfNoneMatch is not None and IfNoneMatch == etag:
+            raise client_error('304', 304)
+        response = {'ETag': etag}
+        if Range is not None:
+            start, end = (int(value) for value in Range[len('bytes='):].split('-'))
+            if start >= len(body):
+                raise client_error('InvalidRange', 416)
+            end = min(end, len(body) - 1)
+            response['ContentRange'] = f"bytes {start}-{end}/{len(body)}"
+            body = body[start:end + 1]
+        response['Body'] = io.BytesIO(body)
+        response['ContentLength'] = len(body)
+        return response
+
+
+class StubTritonClient:
+    """The metadata side of a tritonclient aio client, counting round trips.
+
+    `versions` maps model name -> list of loaded versions; change it to
+    simulate Triton loading a new version.
+    """
+
+    def __init__(self, versions, delay=0.0):
+        self.versions = versions
+        self.delay = delay
+        self.calls = []
+
+    async def get_model_metadata(self, model_name, model_version=''):
+        self.calls.append(('metadata', model_name, model_version))
+        await asyncio.sleep(self.delay)
+        return {'name': model_name, 'versions': list(self.versions[model_name])}
+
+    async def get_model_config(self, model_name, model_version=''):
+        self.calls.append(('config', model_name, model_version))
+        await asyncio.sleep(self.delay)
+        return {'name': model_name, 'max_batch_size': 8}
+
+    async def get_model_repository_index(self):
+        return [
+            {'name': name, 'version': version, 'state': 'READY'}
+            for name, versions in self.versions.items()
+            for version in versions
+        ]
+
+
+def jpeg_bytes(width=320, height=240, color=(200, 40, 90)):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def free_port():
+    with closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as s:
+        s.bind(('', 0))
+        return s.getsockname()[1]
+
+
+@asynccontextmanager
+async def pipeline_server(s3, triton_delay=0.0, triton=None, **kwargs):
+    """A TritonWebSocketServer on fake_triton's HTTP endpoint (`triton` if given), reading S3 through `s3`."""
+    triton = triton or fake_triton.FakeTriton(triton_delay)
+    triton_port = free_port()
+    runner = await triton.serve_http(triton_port)
+    kwargs = dict(dict(preprocess_workers=0, metrics_port=None), **kwargs)
+    server = TritonWebSocketServer(triton_url=f"localhost:{triton_port}", websocket_port=free_port(), **kwargs)
+    server.s3_fetcher.s3_client = s3
+    task = asyncio.create_task(server.start_server())
+    try:
+        for _ in range(100):
+            if task.done():
+                task.result()
+            try:
+                async with websockets.connect(f"ws://localhost:{server.websocket_port}"):
+                    break
+            except OSError:
+                await asyncio.sleep(0.05)
+        yield server
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await runner.cleanup()
+
+
+async def send_request(server, message, **connect_kwargs):
+    """Send one request message to `server` and return its decoded JSON reply."""
+    async with websockets.connect(f"ws://localhost:{server.websocket_port}", **connect_kwargs) as websocket:
+        await websocket.send(message)
+        return json.loads(await websocket.recv())
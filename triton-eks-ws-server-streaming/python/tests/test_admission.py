@@ -0,0 +1,33 @@
+import asyncio
+
+from admission import AdmissionController
+
+
+def test_admission_queues_then_sheds():
+    async def main():
+        admission = AdmissionController(max_inflight=1, max_queued=1, max_queue_wait=1.0)
+        started = await admission.acquire()
+        queued = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        assert admission.queued == 1
+        # Queue full
+        assert await admission.acquire() is None
+        admission.release(started)
+        assert await queued is not None
+        assert admission.stats()['inflight'] == 1
+
+    asyncio.run(main())
+
+
+def test_admission_sheds_after_queue_wait_and_while_triton_is_backed_up():
+    async def main():
+        admission = AdmissionController(max_inflight=1, max_queue_wait=0.02, triton_queue_threshold=0.5)
+        started = await admission.acquire()
+        assert await admission.acquire() is None
+        assert admission.queued == 0
+        admission.release(started)
+        admission.triton_queue_time = 1.0
+        assert await admission.acquire() is None
+        assert admission.retry_after() >= 1.0
+
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+from conftest import StubS3, fake_triton, jpeg_bytes, pipeline_server, send_request
+from deadlines import deadline_after
+from single_flight import SingleFlight
+
+
+def test_single_flight_only_joins_calls_that_outlive_the_caller():
+    async def main():
+        flight = SingleFlight()
+        deadlines = []
+
+        async def call(deadline):
+            deadlines.append(deadline)
+            await asyncio.sleep(0.02)
+            return deadline
+
+        short, long = deadline_after(100), deadline_after(1000)
+        results = await asyncio.gather(
+            flight.run('k', lambda: call(short), short),
+            # Would outlive the short call: starts its own
+            flight.run('k', lambda: call(long), long),
+            # Joins the long one, as does a caller without a deadline only
+            # once a call without one is running
+            flight.run('k', lambda: call(short), short),
+            flight.run('k', lambda: call(None)),
+            flight.run('k', lambda: call(long), long)
+        )
+        assert deadlines == [short, long, None]
+        assert results == [short, long, long, None, None]
+
+    asyncio.run(main())
+
+
+def test_coalesced_requests_do_not_share_a_deadline():
+    async def main():
+        s3 = StubS3({'frame.jpg': (jpeg_bytes(), '"e1"')}, delay=0.05)
+        async with pipeline_server(s3, tensor_cache_bytes=0, result_cache_bytes=0) as server:
+            async def request(request_id, delay=0.0, **options):
+                await asyncio.sleep(delay)
+                return await send_request(server, json.dumps(
+                    dict(bucket='bucket', key='frame.jpg', request_id=request_id, **options)
+                ))
+
+            replies = await asyncio.gather(
+                request('short', deadline_ms=30),
+                *(request(f"open-{i}", delay=0.01) for i in range(3))
+            )
+        assert replies[0]['status'] == 'deadline_exceeded'
+        assert [reply['status'] for reply in replies[1:]] == ['success'] * 3
+        # The short request ran alone; the open ones outlive it and share one run
+        assert len(s3.calls) == 2
+
+    asyncio.run(main())
+
+
+def test_coalesced_run_passes_its_deadline_to_triton():
+    async def main():
+        s3 = StubS3({'frame.jpg': (jpeg_bytes(), '"e1"')}, delay=0.02)
+        triton = fake_triton.FakeTriton(0.0)
+        async with pipeline_server(s3, triton=triton, tensor_cache_bytes=0, result_cache_bytes=0) as server:
+            replies = await asyncio.gather(*(
+                send_request(server, json.dumps({'bucket': 'bucket', 'key': 'frame.jpg', 'deadline_ms': deadline_ms}))
+                for deadline_ms in (2000, 1000)
+            ))
+        assert [reply['status'] for reply in replies] == ['success'] * 2
+        assert len(s3.calls) == 1
+        assert triton.timeouts and all(0 < timeout <= 2000 * 1000 for timeout in triton.timeouts)
+
+    asyncio.run(main())
+
+
+def test_transport_timeout_without_a_deadline_is_an_error():
+    async def main():
+        s3 = StubS3({'frame.jpg': (jpeg_bytes(), '"e1"')})
+        async with pipeline_server(s3) as server:
+            async def timed_out(*args, **kwargs):
+                raise asyncio.TimeoutError()
+
+            server.transport.infer = timed_out
+            reply = await send_request(server, json.dumps({'bucket': 'bucket', 'key': 'frame.jpg'}))
+        assert reply['status'] == 'error'
+
+    asyncio.run(main())
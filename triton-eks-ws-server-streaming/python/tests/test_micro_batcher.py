@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import numpy as np
+
+from deadlines import DeadlineExceeded, deadline_after
+from micro_batcher import MicroBatcher
+
+
+def _batcher(max_batch_size=8, delay=0.0, max_delay=0.01):
+    batches = []
+
+    async def infer_batch(batch, deadline, request_id):
+        batches.append((batch.shape[0], deadline, request_id))
+        await asyncio.sleep(delay)
+        return {'out': batch * 2}
+
+    return MicroBatcher('model', infer_batch, max_batch_size, max_delay=max_delay), batches
+
+
+def test_batcher_splits_outputs_back_per_request():
+    async def main():
+        batcher, batches = _batcher()
+        first, second = await asyncio.gather(
+            batcher.submit(np.full((1, 3), 1.0), request_id='a'),
+            batcher.submit(np.full((2, 3), 5.0), request_id='b')
+        )
+        assert batches == [(3, None, 'a,b')]
+        assert first['out'].tolist() == [[2.0] * 3]
+        assert second['out'].tolist() == [[10.0] * 3] * 2
+
+    asyncio.run(main())
+
+
+def test_batcher_flushes_full_batches_without_waiting():
+    async def main():
+        batcher, batches = _batcher(max_batch_size=2, max_delay=10.0)
+        await asyncio.wait_for(asyncio.gather(*(batcher.submit(np.zeros((1, 3))) for _ in range(4))), 1.0)
+        assert [rows for rows, _, _ in batches] == [2, 2]
+
+    asyncio.run(main())
+
+
+def test_batcher_request_stops_waiting_at_its_own_deadline():
+    async def main():
+        batcher, batches = _batcher(delay=0.2)
+        started = time.monotonic()
+        results = await asyncio.gather(
+            batcher.submit(np.zeros((1, 3)), deadline=deadline_after(50)),
+            batcher.submit(np.zeros((1, 3))),
+            return_exceptions=True
+        )
+        assert isinstance(results[0], DeadlineExceeded)
+        assert results[1]['out'].shape == (1, 3)
+        # The batch ran both, without a deadline since one request had none
+        assert batches == [(2, None, None)]
+        assert time.monotonic() - started >= 0.2
+
+    asyncio.run(main())
+
+
+def test_close_sends_queued_requests_and_waits_for_running_batches():
+    async def main():
+        batcher, batches = _batcher(delay=0.05, max_delay=10.0)
+        submitted = asyncio.ensure_future(batcher.submit(np.zeros((1, 3)), request_id='a'))
+        await asyncio.sleep(0)
+        assert batches == []
+        await batcher.close()
+        # The batch finished before close() returned
+        assert batches == [(1, None, 'a')] and not batcher._tasks
+        assert (await submitted)['out'].shape == (1, 3)
+
+    asyncio.run(main())
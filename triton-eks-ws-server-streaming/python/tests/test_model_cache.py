@@ -0,0 +1,61 @@
+import asyncio
+
+from conftest import StubTritonClient
+from model_cache import ModelMetadataCache
+
+
+def test_metadata_and_config_are_fetched_once():
+    async def main():
+        client = StubTritonClient({'densenet': ['1']}, delay=0.02)
+        cache = ModelMetadataCache(client)
+        # Concurrent misses share one round trip
+        first, second = await asyncio.gather(cache.get_metadata('densenet'), cache.get_metadata('densenet'))
+        assert first is second
+        assert (await cache.get_config('densenet'))['max_batch_size'] == 8
+        await cache.get_config('densenet')
+        assert client.calls == [('metadata', 'densenet', ''), ('config', 'densenet', '')]
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    asyncio.run(main())
+
+
+def test_entries_expire_after_ttl():
+    async def main():
+        client = StubTritonClient({'densenet': ['1']})
+        cache = ModelMetadataCache(client, ttl=0.02)
+        await cache.get_metadata('densenet')
+        await asyncio.sleep(0.03)
+        await cache.get_metadata('densenet')
+        assert len(client.calls) == 2
+
+    asyncio.run(main())
+
+
+def test_get_version_returns_the_newest_numeric_version():
+    async def main():
+        cache = ModelMetadataCache(StubTritonClient({'densenet': ['2', '10', '9'], 'resnet': []}))
+        assert await cache.get_version('densenet') == '10'
+        assert await cache.get_version('resnet') == ''
+
+    asyncio.run(main())
+
+
+def test_repository_index_change_invalidates_only_that_model():
+    async def main():
+        client = StubTritonClient({'densenet': ['1'], 'resnet': ['1']})
+        cache = ModelMetadataCache(client)
+        invalidated = []
+        cache.invalidation_listeners.append(invalidated.append)
+        await cache.warm(['densenet', 'resnet'])
+        # The first poll only records the index
+        await cache.check_repository_index()
+        client.versions['resnet'] = ['1', '2']
+        await cache.check_repository_index()
+        assert invalidated == ['resnet']
+
+        client.calls.clear()
+        assert await cache.get_version('resnet') == '2'
+        await cache.get_metadata('densenet')
+        assert client.calls == [('metadata', 'resnet', '')]
+
+    asyncio.run(main())
@@ -0,0 +1,18 @@
+import asyncio
+import json
+
+from conftest import StubS3, jpeg_bytes, pipeline_server, send_request
+
+
+def test_server_runs_every_model_on_an_s3_image():
+    async def main():
+        s3 = StubS3({'frame.jpg': (jpeg_bytes(), '"e1"')})
+        async with pipeline_server(s3) as server:
+            reply = await send_request(server, json.dumps({
+                'bucket': 'bucket', 'key': 'frame.jpg', 'request_id': 'r1', 'top_k': 2, 'softmax': True
+            }))
+        assert (reply['status'], reply['request_id']) == ('success', 'r1')
+        assert set(reply['outputs']) == {'densenet', 'resnet'}
+        assert len(reply['outputs']['resnet']['resnetv24_dense0_fwd']['class_ids'][0]) == 2
+
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+import websockets
+
+from conftest import StubS3, jpeg_bytes, pipeline_server, send_request
+from pipeline_server import softmax_outputs, top_k_outputs
+from tensor_frames import BINARY_SUBPROTOCOL, decode_tensor_frame
+
+SCORES = np.array([[1.0, 4.0, 2.0, 3.0], [0.5, 0.1, 0.9, 0.2]], dtype=np.float32)
+
+
+def test_softmax_keeps_the_shape_and_sums_to_one_per_row():
+    scores = SCORES.reshape(2, 4, 1, 1)
+    probabilities = softmax_outputs(scores)
+    assert probabilities.shape == scores.shape
+    np.testing.assert_allclose(probabilities.reshape(2, -1).sum(axis=1), [1.0, 1.0], rtol=1e-6)
+    assert probabilities.reshape(2, -1).argmax(axis=1).tolist() == [1, 2]
+
+
+def test_top_k_returns_the_best_classes_first():
+    top = top_k_outputs(SCORES, 2)
+    assert top['class_ids'].tolist() == [[1, 3], [2, 0]]
+    np.testing.assert_array_equal(top['scores'], SCORES[[[0], [1]], [[1, 3], [2, 0]]])
+    # k beyond the number of classes returns them all
+    assert top_k_outputs(SCORES, 10)['class_ids'].shape == (2, 4)
+
+
+def test_top_k_with_softmax_returns_probabilities():
+    top = top_k_outputs(SCORES, 1, softmax=True)
+    np.testing.assert_allclose(top['scores'], softmax_outputs(SCORES).max(axis=1, keepdims=True))
+
+
+def _request(**options):
+    return json.dumps(dict(bucket='bucket', key='frame.jpg', **options))
+
+
+def test_server_applies_softmax_without_top_k():
+    async def main():
+        async with pipeline_server(StubS3({'frame.jpg': (jpeg_bytes(), '"e1"')})) as server:
+            reply = await send_request(server, _request(softmax=True))
+        scores = np.array(reply['outputs']['resnet']['resnetv24_dense0_fwd'])
+        assert scores.shape == (1, 1000)
+        np.testing.assert_allclose(scores.sum(axis=1), [1.0], rtol=1e-5)
+
+    asyncio.run(main())
+
+
+def test_server_sends_top_k_as_tensor_frames():
+    async def main():
+        async with pipeline_server(StubS3({'frame.jpg': (jpeg_bytes(), '"e1"')})) as server:
+            async with websockets.connect(
+                f"ws://localhost:{server.websocket_port}", subprotocols=[BINARY_SUBPROTOCOL]
+            ) as websocket:
+                await websocket.send(_request(top_k=3))
+                return decode_tensor_frame(await websocket.recv())
+
+    reply = asyncio.run(main())
+    assert reply['status'] == 'success'
+    top = reply['outputs']['densenet']['fc6_1']
+    assert top['class_ids'].shape == top['scores'].shape == (1, 3)
+    assert top['class_ids'].dtype.kind == 'i'
+
+
+@pytest.mark.parametrize('top_k', [0, True, 2.5, '3'])
+def test_server_rejects_an_invalid_top_k(top_k):
+    async def main():
+        async with pipeline_server(StubS3({'frame.jpg': (jpeg_bytes(), '"e1"')})) as server:
+            return await send_request(server, _request(top_k=top_k))
+
+    reply = asyncio.run(main())
+    assert reply['status'] == 'error' and 'top_k' in reply['message']
@@ -0,0 +1,86 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from conftest import jpeg_bytes
+from preprocessing import (
+    IMAGENET_NORMALIZATION, PIXEL_VALUES, BufferFile, Normalization, decode_image, open_image, reduce_image,
+    resize_center_crop
+)
+
+PIXELS = np.random.default_rng(0).integers(0, 256, size=(4, 5, 3), dtype=np.uint8)
+
+
+def _reference(pixels, scale, mean, std):
+    normalized = (pixels.astype(np.float64) * scale - np.array(mean)) / np.array(std)
+    return normalized.transpose(2, 0, 1).astype(np.float32)
+
+
+def test_normalization_matches_the_reference_formula():
+    out = np.empty((3, 4, 5), dtype=np.float32)
+    assert IMAGENET_NORMALIZATION.apply(PIXELS, out) is out
+    np.testing.assert_allclose(
+        out, _reference(PIXELS, 1 / 255.0, IMAGENET_NORMALIZATION.mean, IMAGENET_NORMALIZATION.std),
+        rtol=1e-5, atol=1e-5
+    )
+    np.testing.assert_array_equal(PIXEL_VALUES.apply(PIXELS, np.empty((3, 4, 5), dtype=np.float32)),
+                                  _reference(PIXELS, 1.0, (0, 0, 0), (1, 1, 1)))
+
+
+def test_normalization_writes_into_a_batch_slot():
+    batch = np.zeros((2, 3, 4, 5), dtype=np.float32)
+    Normalization().apply(PIXELS, batch[1])
+    assert not batch[0].any()
+    np.testing.assert_allclose(batch[1], _reference(PIXELS, 1 / 255.0, (0, 0, 0), (1, 1, 1)), rtol=1e-6)
+    # A 1xCHW buffer is filled in place too
+    single = np.zeros((1, 3, 4, 5), dtype=np.float32)
+    Normalization().apply(PIXELS, single)
+    np.testing.assert_array_equal(single[0], batch[1])
+
+
+def test_normalization_from_config():
+    assert Normalization.from_config(None).key() == Normalization().key()
+    assert Normalization.from_config(IMAGENET_NORMALIZATION) is IMAGENET_NORMALIZATION
+    normalization = Normalization.from_config({'scale': 1.0, 'mean': (1, 2, 3)})
+    assert normalization.key() == (1.0, (1.0, 2.0, 3.0), (1.0, 1.0, 1.0))
+
+
+def _png_bytes(width, height, color=(10, 200, 30)):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('image_bytes', [jpeg_bytes(2000, 1500), _png_bytes(1000, 900)])
+def test_decode_image_scales_down_to_the_requested_size(image_bytes):
+    image = decode_image(image_bytes, size=(224, 224))
+    assert (image.mode, image.size) == ('RGB', (224, 224))
+    # A flat colour survives the reduced decode
+    assert np.abs(np.asarray(image, dtype=np.int16) - np.asarray(image)[112, 112]).max() <= 3
+
+
+def test_decode_image_reads_any_bytes_like_object():
+    image_bytes = jpeg_bytes()
+    assert decode_image(memoryview(image_bytes)).size == decode_image(image_bytes).size
+    file = BufferFile(bytearray(b'0123456789'))
+    assert (file.read(4), file.seek(-2, io.SEEK_END), file.read()) == (b'0123', 8, b'89')
+
+
+def test_decode_image_refuses_images_over_the_pixel_budget():
+    with pytest.raises(ValueError, match='pixel budget'):
+        decode_image(jpeg_bytes(2000, 1500), max_pixels=1000 * 1000)
+
+
+def test_reduce_image_leaves_a_decoded_original_at_full_size():
+    original = open_image(jpeg_bytes(3000, 2000)).convert('RGB')
+    reduced = reduce_image(original, (256, 256))
+    assert original.size == (3000, 2000)
+    assert reduced.size[0] >= 256 and reduced.size[1] >= 256 and reduced.size[1] < 512
+
+
+def test_resize_center_crop_keeps_the_aspect_ratio():
+    image = Image.new('RGB', (640, 480))
+    assert resize_center_crop(image).size == (224, 224)
+    assert resize_center_crop(image, resize=100, crop=50).size == (50, 50)
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from conftest import StubS3, StubTritonClient, fake_triton, jpeg_bytes, pipeline_server, send_request
+from model_cache import ModelMetadataCache
+from result_cache import ResultCache, content_hash
+
+OUTPUTS = {'fc6_1': np.arange(10, dtype=np.float32).reshape(1, 10)}
+
+
+def test_identical_inputs_share_a_content_hash():
+    image = np.ones((1, 3, 4, 4), dtype=np.float32)
+    assert content_hash(image) == content_hash(image.copy())
+    assert content_hash(image) != content_hash(image.astype(np.float16))
+    assert content_hash(image) != content_hash(image.reshape(1, 3, 16))
+
+
+def test_outputs_are_cached_per_model_version():
+    cache = ResultCache()
+    cache.put('h', 'densenet', '1', OUTPUTS)
+    cached = cache.get('h', 'densenet', 1)
+    np.testing.assert_array_equal(cached['fc6_1'], OUTPUTS['fc6_1'])
+    assert not cached['fc6_1'].flags.writeable
+    assert cache.get('h', 'densenet', '2') is None
+    assert cache.get('h', 'resnet', '1') is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_entries_expire_and_stay_within_max_bytes():
+    nbytes = OUTPUTS['fc6_1'].nbytes
+    cache = ResultCache(max_bytes=nbytes * 2, ttl=0.02)
+    for input_hash in ('a', 'b', 'c'):
+        cache.put(input_hash, 'densenet', '1', OUTPUTS)
+    assert cache.get('a', 'densenet', '1') is None
+    assert cache.stats()['evictions'] == 1 and cache.stats()['bytes'] == nbytes * 2
+    time.sleep(0.03)
+    assert cache.get('b', 'densenet', '1') is None
+    assert cache.stats()['entries'] == 1
+
+
+def test_new_model_version_invalidates_that_models_outputs():
+    async def main():
+        client = StubTritonClient({'densenet': ['1'], 'resnet': ['1']})
+        model_cache = ModelMetadataCache(client)
+        cache = ResultCache()
+        # Wired up as the server does
+        model_cache.invalidation_listeners.append(cache.invalidate_model)
+        await model_cache.check_repository_index()
+        for model_name in ('densenet', 'resnet'):
+            cache.put('h', model_name, await model_cache.get_version(model_name), OUTPUTS)
+
+        client.versions['densenet'] = ['2']
+        await model_cache.check_repository_index()
+        assert cache.stats()['entries'] == 1
+        assert cache.get('h', 'resnet', await model_cache.get_version('resnet')) is not None
+        assert await model_cache.get_version('densenet') == '2'
+        assert cache.get('h', 'densenet', '1') is None
+
+    asyncio.run(main())
+
+
+def test_server_answers_the_same_image_under_another_key_from_the_cache():
+    async def main():
+        image = jpeg_bytes()
+        s3 = StubS3({'a.jpg': (image, '"e1"'), 'b.jpg': (image, '"e2"')})
+        triton = fake_triton.FakeTriton(0.0)
+        async with pipeline_server(s3, triton=triton) as server:
+            first = await send_request(server, json.dumps({'bucket': 'bucket', 'key': 'a.jpg'}))
+            inferences = triton.inferences
+            second = await send_request(server, json.dumps({'bucket': 'bucket', 'key': 'b.jpg'}))
+        assert first['status'] == second['status'] == 'success'
+        assert first['outputs'] == second['outputs']
+        assert triton.inferences == inferences == 2
+
+    asyncio.run(main())
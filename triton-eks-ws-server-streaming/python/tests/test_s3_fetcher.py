@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from conftest import StubS3
+from s3_fetcher import S3Fetcher
+
+
+def test_fetch_small_object_in_one_get():
+    s3 = StubS3({'a.jpg': (b'0123456789', '"e1"')})
+    fetcher = S3Fetcher(part_size=64, s3_client=s3)
+    s3_object = asyncio.run(fetcher.fetch('bucket', 'a.jpg'))
+    assert (s3_object.body, s3_object.etag, s3_object.size) == (b'0123456789', '"e1"', 10)
+    assert [call['Range'] for call in s3.calls] == ['bytes=0-63']
+
+
+@pytest.mark.parametrize('sync', [False, True])
+def test_fetch_large_object_in_ranged_parts_pinned_to_etag(sync):
+    body = bytes(range(10))
+    s3 = StubS3({'a.jpg': (body, '"e1"')})
+    fetcher = S3Fetcher(part_size=4, s3_client=s3)
+    s3_object = fetcher.get('bucket', 'a.jpg') if sync else asyncio.run(fetcher.fetch('bucket', 'a.jpg'))
+    assert s3_object.body == body
+    assert sorted(call['Range'] for call in s3.calls) == ['bytes=0-3', 'bytes=4-7', 'bytes=8-9']
+    assert all(call['IfMatch'] == '"e1"' for call in s3.calls if call['Range'] != 'bytes=0-3')
+
+
+def test_fetch_if_none_match_returns_not_modified():
+    s3 = StubS3({'a.jpg': (b'0123456789', '"e1"')})
+    s3_object = asyncio.run(S3Fetcher(s3_client=s3).fetch('bucket', 'a.jpg', if_none_match='"e1"'))
+    assert s3_object.not_modified and s3_object.body is None and s3_object.etag == '"e1"'
+
+
+def test_fetch_empty_object_falls_back_from_invalid_range():
+    s3 = StubS3({'empty': (b'', '"e0"')})
+    s3_object = asyncio.run(S3Fetcher(s3_client=s3).fetch('bucket', 'empty'))
+    assert (s3_object.body, s3_object.size) == (b'', 0)
+    assert [call['Range'] for call in s3.calls] == ['bytes=0-8388607', None]
+
+
+def test_fetch_times_out():
+    s3 = StubS3({'a.jpg': (b'0123456789', '"e1"')}, delay=0.2)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(S3Fetcher(s3_client=s3).fetch('bucket', 'a.jpg', timeout=0.05))
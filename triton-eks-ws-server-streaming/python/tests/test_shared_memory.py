@@ -0,0 +1,140 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+import numpy as np
+import pytest
+
+from conftest import fake_triton, free_port
+from shared_memory_pool import SharedMemoryPool
+from triton_transport import TRANSPORTS, create_transport
+
+MODEL = 'resnet50_onnx'
+INPUT_NAME, OUTPUT_NAME, OUTPUT_SHAPE = fake_triton.MODELS[MODEL]
+OUTPUTS = fake_triton.model_metadata(MODEL)['outputs']
+
+
+@asynccontextmanager
+async def triton_endpoints(delay=0.0):
+    """fake_triton on HTTP and gRPC; yields it and {protocol: url}."""
+    triton = fake_triton.FakeTriton(delay)
+    http_port, grpc_port = free_port(), free_port()
+    runner = await triton.serve_http(http_port)
+    server = await triton.serve_grpc(grpc_port)
+    try:
+        yield triton, {'http': f"localhost:{http_port}", 'grpc': f"localhost:{grpc_port}"}
+    finally:
+        await server.stop(None)
+        await runner.cleanup()
+
+
+def _image(batch=1):
+    return np.random.default_rng(0).random((batch,) + tuple(fake_triton.INPUT_SHAPE), dtype=np.float32)
+
+
+def _region_files(prefix):
+    return [name for name in os.listdir('/dev/shm') if name.startswith(prefix)]
+
+
+@pytest.mark.parametrize('name', sorted(TRANSPORTS))
+def test_transport_exchanges_tensors_through_shared_memory(name):
+    async def main():
+        async with triton_endpoints() as (triton, urls):
+            pool = SharedMemoryPool(regions=2, region_bytes=1024 * 1024, prefix=f"ws_test_{name}_{os.getpid()}")
+            transport = create_transport(name, urls[TRANSPORTS[name].protocol], shared_memory=pool)
+            await transport.start()
+            try:
+                assert sorted(triton.regions) == [f"{pool.prefix}_0", f"{pool.prefix}_1"]
+                outputs = await transport.infer(MODEL, INPUT_NAME, _image(), 'FP32', request_id='r1', outputs=OUTPUTS)
+                assert outputs[OUTPUT_NAME].shape == (1,) + tuple(OUTPUT_SHAPE)
+                assert triton.shared_memory_inferences == 1
+                assert pool.stats() == {'regions': 2, 'free': 2, 'used': 1, 'fallbacks': 0}
+            finally:
+                await transport.close()
+            assert triton.regions == {}
+            assert _region_files(pool.prefix) == []
+
+    asyncio.run(main())
+
+
+def test_tensors_that_do_not_fit_go_over_the_socket():
+    async def main():
+        async with triton_endpoints() as (triton, urls):
+            pool = SharedMemoryPool(regions=1, region_bytes=1024 * 1024, prefix=f"ws_test_fit_{os.getpid()}")
+            transport = create_transport('http', urls['http'], shared_memory=pool)
+            await transport.start()
+            try:
+                outputs = await transport.infer(MODEL, INPUT_NAME, _image(batch=2), 'FP32', outputs=OUTPUTS)
+                assert outputs[OUTPUT_NAME].shape == (2,) + tuple(OUTPUT_SHAPE)
+                assert triton.shared_memory_inferences == 0
+                assert pool.fallbacks == 1
+            finally:
+                await transport.close()
+
+    asyncio.run(main())
+
+
+def test_region_stays_reserved_until_triton_answers_an_abandoned_call():
+    async def main():
+        async with triton_endpoints(delay=0.2) as (triton, urls):
+            pool = SharedMemoryPool(regions=1, region_bytes=1024 * 1024, prefix=f"ws_test_abandon_{os.getpid()}")
+            transport = create_transport('grpc', urls['grpc'], shared_memory=pool)
+            await transport.start()
+            try:
+                with pytest.raises(asyncio.TimeoutError):
+                    await asyncio.wait_for(
+                        transport.infer(MODEL, INPUT_NAME, _image(), 'FP32', outputs=OUTPUTS), 0.05
+                    )
+                # Triton may still write the outputs into it
+                assert pool.stats()['free'] == 0
+                await asyncio.sleep(0.3)
+                assert pool.stats()['free'] == 1
+            finally:
+                await transport.close()
+
+    asyncio.run(main())
+
+
+def test_failed_registration_leaves_another_owners_regions_alone():
+    async def main():
+        async with triton_endpoints() as (triton, urls):
+            prefix = f"ws_test_owner_{os.getpid()}"
+            owner = create_transport('http', urls['http'], shared_memory=SharedMemoryPool(regions=1, prefix=prefix))
+            await owner.start()
+            # Same region names: create_only refuses them
+            other = create_transport('http', urls['http'], shared_memory=SharedMemoryPool(regions=1, prefix=prefix))
+            await other.start()
+            try:
+                assert other.shared_memory is None
+                assert list(triton.regions) == [f"{prefix}_0"]
+                assert _region_files(prefix) == [f"{prefix}_0"]
+                outputs = await other.infer(MODEL, INPUT_NAME, _image(), 'FP32', outputs=OUTPUTS)
+                assert OUTPUT_NAME in outputs
+            finally:
+                await other.close()
+                await owner.close()
+            assert _region_files(prefix) == []
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize('shape, shared', [
+    (['-1'] + [str(dim) for dim in OUTPUT_SHAPE], True),
+    ([-1, -1, 1, 1], False),
+    ([1, 1000, -1, 1], False)
+])
+def test_only_the_batch_dimension_may_be_variable(shape, shared):
+    async def main():
+        async with triton_endpoints() as (triton, urls):
+            pool = SharedMemoryPool(regions=1, region_bytes=1024 * 1024, prefix=f"ws_test_dims_{os.getpid()}")
+            transport = create_transport('http', urls['http'], shared_memory=pool)
+            await transport.start()
+            try:
+                outputs = [{'name': OUTPUT_NAME, 'datatype': 'FP32', 'shape': shape}]
+                result = await transport.infer(MODEL, INPUT_NAME, _image(), 'FP32', outputs=outputs)
+                assert result[OUTPUT_NAME].shape == (1,) + tuple(OUTPUT_SHAPE)
+                assert (triton.shared_memory_inferences, pool.fallbacks) == ((1, 0) if shared else (0, 1))
+            finally:
+                await transport.close()
+
+    asyncio.run(main())
@@ -0,0 +1,44 @@
+import asyncio
+
+from single_flight import SingleFlight
+
+
+def test_single_flight_shares_one_call_and_its_error():
+    async def main():
+        flight = SingleFlight()
+        calls = []
+
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return 'result'
+
+        async def failing():
+            await asyncio.sleep(0.02)
+            raise ValueError('boom')
+
+        assert await asyncio.gather(flight.run('k', call), flight.run('k', call)) == ['result', 'result']
+        assert (len(calls), flight.calls, flight.coalesced) == (1, 1, 1)
+        # Finished calls are not kept
+        assert await flight.run('k', call) == 'result' and len(calls) == 2
+        results = await asyncio.gather(flight.run('f', failing), flight.run('f', failing), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+
+    asyncio.run(main())
+
+
+def test_single_flight_call_survives_a_cancelled_caller():
+    async def main():
+        flight = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.05)
+            return 'result'
+
+        first = asyncio.create_task(flight.run('k', call))
+        second = asyncio.create_task(flight.run('k', call))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == 'result'
+
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+import websockets
+
+from conftest import StubS3, jpeg_bytes, pipeline_server
+from tensor_frames import image_frame_fragments
+
+
+async def _stream(server, message):
+    """Send a request and collect replies up to the final one."""
+    replies = []
+    async with websockets.connect(f"ws://localhost:{server.websocket_port}") as websocket:
+        await websocket.send(message)
+        while not replies or replies[-1]['status'] == 'partial':
+            replies.append(json.loads(await websocket.recv()))
+    return replies
+
+
+def test_each_model_is_sent_as_it_finishes():
+    async def main():
+        s3 = StubS3({'frame.jpg': (jpeg_bytes(), '"e1"')})
+        async with pipeline_server(s3) as server:
+            return await _stream(server, json.dumps({
+                'bucket': 'bucket', 'key': 'frame.jpg', 'request_id': 's1', 'stream': True, 'top_k': 1
+            }))
+
+    *partials, final = asyncio.run(main())
+    assert sorted(partial['model'] for partial in partials) == ['densenet', 'resnet']
+    for partial in partials:
+        assert (partial['request_id'], list(partial['outputs'])) == ('s1', [partial['model']])
+    # The outputs went out in the partial messages
+    assert (final['status'], final['request_id']) == ('success', 's1')
+    assert sorted(final['models']) == ['densenet', 'resnet'] and 'outputs' not in final
+
+
+def test_an_uploaded_image_streams_too():
+    async def main():
+        async with pipeline_server(StubS3({})) as server:
+            return await _stream(server, image_frame_fragments({'stream': True}, jpeg_bytes(), 1024))
+
+    *partials, final = asyncio.run(main())
+    assert len(partials) == 2 and final['status'] == 'success'
+
+
+def test_a_failed_model_reports_the_models_already_sent():
+    async def main():
+        s3 = StubS3({'frame.jpg': (jpeg_bytes(), '"e1"')})
+        async with pipeline_server(s3) as server:
+            infer = server.transport.infer
+
+            async def resnet_fails(model_name, *args, **kwargs):
+                if model_name == 'resnet50_onnx':
+                    await asyncio.sleep(0.1)
+                    raise RuntimeError('resnet unavailable')
+                return await infer(model_name, *args, **kwargs)
+
+            server.transport.infer = resnet_fails
+            return await _stream(server, json.dumps({'bucket': 'bucket', 'key': 'frame.jpg', 'stream': True}))
+
+    *partials, final = asyncio.run(main())
+    assert [partial['model'] for partial in partials] == ['densenet']
+    assert (final['status'], final['models']) == ('error', ['densenet'])
+    assert 'resnet unavailable' in final['message']
@@ -0,0 +1,82 @@
+import asyncio
+import os
+
+import numpy as np
+
+from tensor_cache import TensorCache
+
+TENSOR = np.ones((1, 3, 8, 8), dtype=np.float32)
+
+
+async def _settle():
+    # Lets spill writes and removals on the executor finish
+    for _ in range(50):
+        await asyncio.sleep(0.01)
+
+
+def _spilled_cache(tmp_path):
+    """A cache holding 'k1' in memory and 'k0' spilled to disk."""
+    cache = TensorCache(max_bytes=TENSOR.nbytes, spill_dir=str(tmp_path), max_spill_bytes=TENSOR.nbytes * 4)
+    cache.put('bucket', 'k0', '"e0"', TENSOR * 0)
+    cache.put('bucket', 'k1', '"e1"', TENSOR * 1)
+    return cache
+
+
+def test_evicted_entry_is_spilled_and_promoted_back(tmp_path):
+    async def main():
+        cache = _spilled_cache(tmp_path)
+        await _settle()
+        assert cache.stats()['spilled_entries'] == 1 and len(os.listdir(tmp_path)) == 1
+
+        etag, tensor, fresh = await cache.lookup('bucket', 'k0')
+        assert (etag, fresh) == ('"e0"', True)
+        np.testing.assert_array_equal(tensor, TENSOR * 0)
+        assert not tensor.flags.writeable
+        # k0 is back in memory and k1 took its place on disk
+        await _settle()
+        stats = cache.stats()
+        assert (stats['spill_hits'], stats['entries'], stats['spilled_entries']) == (1, 1, 1)
+        assert len(os.listdir(tmp_path)) == 1
+        np.testing.assert_array_equal((await cache.lookup('bucket', 'k1'))[1], TENSOR * 1)
+
+    asyncio.run(main())
+
+
+def test_entry_being_spilled_is_promoted_from_memory(tmp_path):
+    async def main():
+        cache = _spilled_cache(tmp_path)
+        # The write has not finished yet
+        np.testing.assert_array_equal((await cache.lookup('bucket', 'k0'))[1], TENSOR * 0)
+        await _settle()
+        # Only k1's file is left
+        assert cache.stats()['spilled_entries'] == 1 and len(os.listdir(tmp_path)) == 1
+
+    asyncio.run(main())
+
+
+def test_concurrent_lookups_share_one_read_of_a_spilled_entry(tmp_path):
+    async def main():
+        cache = _spilled_cache(tmp_path)
+        await _settle()
+        results = await asyncio.gather(*(cache.lookup('bucket', 'k0') for _ in range(3)))
+        assert all(result is not None and result[0] == '"e0"' for result in results)
+        assert results[0][1] is results[1][1] is results[2][1]
+        # Promoted once, and still found afterwards
+        assert cache.stats()['spill_hits'] == 1 and cache.misses == 0
+        assert (await cache.lookup('bucket', 'k0'))[1] is results[0][1]
+
+    asyncio.run(main())
+
+
+def test_missing_spill_file_is_a_miss(tmp_path):
+    async def main():
+        cache = _spilled_cache(tmp_path)
+        await _settle()
+        for name in os.listdir(tmp_path):
+            os.remove(tmp_path / name)
+        assert await cache.lookup('bucket', 'k0') is None
+        # Forgotten, so later lookups miss without touching the disk
+        assert await cache.lookup('bucket', 'k0') is None
+        assert cache.misses == 2
+
+    asyncio.run(main())
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from tensor_frames import (
+    decode_image_frame, decode_tensor_frame, encode_image_frame, encode_tensor_frame, image_frame_fragments
+)
+
+
+def test_tensor_frame_round_trip():
+    outputs = {
+        'densenet': {'fc6_1': np.arange(10, dtype=np.float32).reshape(1, 10, 1, 1)},
+        'resnet': {'top': {'class_ids': np.array([[3, 1]], dtype=np.int64),
+                           'scores': np.array([[0.5, 0.25]], dtype=np.float16)}}
+    }
+    frame = encode_tensor_frame({'status': 'success', 'request_id': 'r1'}, outputs)
+    decoded = decode_tensor_frame(frame)
+    assert (decoded['status'], decoded['request_id']) == ('success', 'r1')
+    np.testing.assert_array_equal(decoded['outputs']['densenet']['fc6_1'], outputs['densenet']['fc6_1'])
+    for name in ('class_ids', 'scores'):
+        value = decoded['outputs']['resnet']['top'][name]
+        assert value.dtype == outputs['resnet']['top'][name].dtype
+        np.testing.assert_array_equal(value, outputs['resnet']['top'][name])
+
+
+def test_image_frame_round_trip_through_fragments():
+    image = np.arange(1000, dtype=np.uint8)
+    fragments = image_frame_fragments({'request_id': 'u1', 'top_k': 3}, image, fragment_bytes=300)
+    assert [len(fragment) for fragment in fragments[1:]] == [300, 300, 300, 100]
+    header, view = decode_image_frame(b''.join(fragments))
+    assert header == {'request_id': 'u1', 'top_k': 3}
+    assert isinstance(view, memoryview) and view.tobytes() == image.tobytes()
+    assert b''.join(fragments) == encode_image_frame({'request_id': 'u1', 'top_k': 3}, image)
+
+
+@pytest.mark.parametrize('frame', [b'\x01', b'\xff\x00\x00\x00{}', encode_image_frame({}, b'')])
+def test_image_frame_rejects_malformed_frames(frame):
+    with pytest.raises(ValueError):
+        decode_image_frame(frame)
@@ -0,0 +1,24 @@
+import asyncio
+
+from conftest import StubS3, jpeg_bytes, pipeline_server, send_request
+from tensor_frames import image_frame_fragments
+
+
+def test_server_runs_an_uploaded_image_without_s3():
+    async def main():
+        s3 = StubS3({})
+        async with pipeline_server(s3) as server:
+            reply = await send_request(server, image_frame_fragments({'request_id': 'u1'}, jpeg_bytes(), 1024))
+        assert (reply['status'], reply['request_id']) == ('success', 'u1')
+        assert s3.calls == []
+
+    asyncio.run(main())
+
+
+def test_server_rejects_an_upload_that_is_not_an_image():
+    async def main():
+        async with pipeline_server(StubS3({})) as server:
+            reply = await send_request(server, image_frame_fragments({'request_id': 'u2'}, b'not an image', 1024))
+        assert (reply['status'], reply['request_id']) == ('error', 'u2')
+
+    asyncio.run(main())
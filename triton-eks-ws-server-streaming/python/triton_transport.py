@@ -0,0 +1,336 @@
+"""How the WebSocket server talks to Triton.
+
+Each transport wraps one tritonclient asyncio client behind the same small
+interface, so the server picks HTTP, gRPC or gRPC streaming by name
+(`transport=` option or the launcher's --transport flag) instead of by
+keeping a copy of itself per client library:
+
+    transport = create_transport('grpc', 'localhost:8001')
+    await transport.start()                   # on the serving event loop
+    outputs = await transport.infer(model, input_name, array, 'FP32')
+    await transport.close()
+
+`client` is the underlying tritonclient client, for ModelMetadataCache
+(with `as_json`, since the gRPC client returns protobuf messages unless asked
+for JSON). Any transport can pass tensors through a SharedMemoryPool instead
+of the socket when Triton runs alongside the server. Set up and compared in
+benchmarks/transport_benchmark.py.
+"""
+import asyncio
+import itertools
+from abc import ABC, abstractmethod
+
+import grpc
+import numpy as np
+import tritonclient.grpc.aio as grpcclient
+import tritonclient.http.aio as httpclient
+from tritonclient.grpc import MAX_GRPC_MESSAGE_SIZE, service_pb2, service_pb2_grpc
+from tritonclient.utils import InferenceServerException, triton_to_np_dtype
+
+
+class TritonTransport(ABC):
+    """Base class: a Triton client created on the event loop that uses it."""
+
+    name = None
+    # Triton endpoint the transport connects to: 'http' or 'grpc'
+    protocol = None
+    default_url = None
+    # Whether ModelMetadataCache must ask the client for JSON
+    as_json = False
+
+    def __init__(self, url=None, conn_limit=256, streams=1, shared_memory=None):
+        self.url = url or self.default_url
+        # Concurrent connections to Triton, where the client pools them
+        self.conn_limit = conn_limit
+        # Bidirectional streams requests are spread over, for streaming transports
+        self.streams = streams
+        # SharedMemoryPool for tensors, registered with Triton in start()
+        self.shared_memory = shared_memory
+        self.client = None
+
+    async def start(self):
+        self.client = self._create_client()
+        print(f"Initialized Triton {self.name} client with URL: {self.url}")
+        if self.shared_memory:
+            try:
+                await self.shared_memory.register(self.client)
+            except Exception as e:
+                # e.g. Triton is not on this host; tensors go over the socket
+                print(f"Could not register shared memory with Triton, not using it: {str(e)}")
+                await self.shared_memory.unregister(self.client)
+                self.shared_memory = None
+
+    async def infer(self, model_name, input_name, input_data, datatype, request_id='', timeout=None,
+                    outputs=None):
+        """Run one inference and return {output name: numpy array}.
+
+        `timeout` (seconds) is passed to Triton, which may drop the request
+        once it runs out; waiting on the call itself is the caller's business.
+        With a shared memory pool, passing the model metadata's `outputs`
+        lets the tensors go through a shared memory region.
+        """
+        placement = self.shared_memory.reserve(input_data, outputs) if self.shared_memory and outputs else None
+        if placement is None:
+            return await self._infer(model_name, input_name, input_data, datatype, request_id, timeout)
+        self.shared_memory.write_input(placement, input_data)
+        call = asyncio.ensure_future(
+            self._infer(model_name, input_name, input_data, datatype, request_id, timeout, placement)
+        )
+        call.add_done_callback(lambda _: self._release_placement(call, placement))
+        # A caller that gives up (deadline) must not free the region while
+        # Triton may still write the outputs into it; the call runs on and
+        # frees it once Triton has answered
+        return await asyncio.shield(call)
+
+    async def get_inference_statistics(self):
+        """Triton's per-model statistics as a dict ({'model_stats': [...]})."""
+        return await self.client.get_inference_statistics(**self._json_kwargs())
+
+    async def close(self):
+        if self.client is not None:
+            if self.shared_memory:
+                await self.shared_memory.unregister(self.client)
+            await self.client.close()
+
+    @abstractmethod
+    def _create_client(self):
+        """The tritonclient client for `url`."""
+
+    @abstractmethod
+    async def _infer(self, model_name, input_name, input_data, datatype, request_id, timeout, placement=None):
+        """infer() with the tensors either in the request or at `placement`."""
+
+    def _release_placement(self, call, placement):
+        self.shared_memory.release(placement)
+        if not call.cancelled():
+            # Marks an abandoned call's failure as handled
+            call.exception()
+
+    def _json_kwargs(self):
+        return {'as_json': True} if self.as_json else {}
+
+
+def _triton_timeout(timeout):
+    # Triton takes request timeouts in microseconds
+    return int(timeout * 1e6) if timeout is not None else None
+
+
+def _client_tensors(client_module, input_name, input_data, datatype, placement):
+    """tritonclient input and requested outputs, in shared memory if placed there."""
+    input_tensor = client_module.InferInput(input_name, input_data.shape, datatype)
+    if placement is None:
+        input_tensor.set_data_from_numpy(input_data)
+        # All outputs, returned in the response
+        return input_tensor, None
+    input_tensor.set_shared_memory(placement.region, placement.input_bytes)
+    outputs = []
+    for name, _, offset, byte_size in placement.outputs:
+        output = client_module.InferRequestedOutput(name)
+        output.set_shared_memory(placement.region, byte_size, offset)
+        outputs.append(output)
+    return input_tensor, outputs
+
+
+def _response_outputs(response, shared_memory, placement):
+    """{name: numpy array} from a gRPC ModelInferResponse message."""
+    if placement is not None:
+        return {
+            output.name: shared_memory.read_output(placement, output.name, list(output.shape))
+            for output in response.outputs
+        }
+    return {
+        output.name: np.frombuffer(raw, dtype=triton_to_np_dtype(output.datatype)).reshape(tuple(output.shape))
+        for output, raw in zip(response.outputs, response.raw_output_contents)
+    }
+
+
+class HttpTransport(TritonTransport):
+    """KServe v2 over HTTP/1.1 with binary tensor data, on a pooled aiohttp session."""
+
+    name = 'http'
+    protocol = 'http'
+    default_url = 'localhost:8000'
+
+    def _create_client(self):
+        return httpclient.InferenceServerClient(url=self.url, conn_limit=self.conn_limit)
+
+    async def _infer(self, model_name, input_name, input_data, datatype, request_id, timeout, placement=None):
+        input_tensor, outputs = _client_tensors(httpclient, input_name, input_data, datatype, placement)
+        response = await self.client.infer(
+            model_name=model_name,
+            inputs=[input_tensor],
+            outputs=outputs,
+            request_id=request_id or '',
+            timeout=_triton_timeout(timeout)
+        )
+        if placement is not None:
+            return {
+                output['name']: self.shared_memory.read_output(placement, output['name'], output['shape'])
+                for output in response.get_response()['outputs']
+            }
+        return {
+            output['name']: response.as_numpy(output['name'])
+            for output in response.get_response()['outputs']
+        }
+
+
+class GrpcTransport(TritonTransport):
+    """Unary ModelInfer calls multiplexed over one HTTP/2 channel (conn_limit unused)."""
+
+    name = 'grpc'
+    protocol = 'grpc'
+    default_url = 'localhost:8001'
+    as_json = True
+
+    def _create_client(self):
+        return grpcclient.InferenceServerClient(url=self.url)
+
+    async def _infer(self, model_name, input_name, input_data, datatype, request_id, timeout, placement=None):
+        input_tensor, outputs = _client_tensors(grpcclient, input_name, input_data, datatype, placement)
+        response = await self.client.infer(
+            model_name=model_name,
+            inputs=[input_tensor],
+            outputs=outputs,
+            request_id=request_id or '',
+            timeout=_triton_timeout(timeout)
+        )
+        return _response_outputs(response.get_response(), self.shared_memory, placement)
+
+
+class GrpcStreamTransport(GrpcTransport):
+    """Inference multiplexed over long-lived ModelStreamInfer streams.
+
+    Every request goes out on one of `streams` bidirectional streams (each
+    on its own channel) that stay open across requests, so a request costs
+    one message instead of a new HTTP/2 stream with its headers. Responses
+    come back in any order and are matched to their caller by request ID.
+    Metadata, config and statistics calls use the unary gRPC client.
+    """
+
+    name = 'grpc_stream'
+
+    async def start(self):
+        await super().start()
+        self._streams = [_InferStream(self.url) for _ in range(max(1, self.streams))]
+        self._next_stream = itertools.cycle(self._streams)
+        print(f"Opened {len(self._streams)} Triton inference stream(s) to {self.url}")
+
+    async def _infer(self, model_name, input_name, input_data, datatype, request_id, timeout, placement=None):
+        request = service_pb2.ModelInferRequest(model_name=model_name)
+        input_tensor = request.inputs.add(name=input_name, datatype=datatype, shape=input_data.shape)
+        if placement is None:
+            request.raw_input_contents.append(input_data.tobytes())
+        else:
+            _set_shared_memory(input_tensor.parameters, placement.region, placement.input_bytes)
+            for name, _, offset, byte_size in placement.outputs:
+                output = request.outputs.add(name=name)
+                _set_shared_memory(output.parameters, placement.region, byte_size, offset)
+        if timeout is not None:
+            request.parameters['timeout'].int64_param = _triton_timeout(timeout)
+        response = await next(self._next_stream).infer(request, request_id)
+        return _response_outputs(response, self.shared_memory, placement)
+
+    async def close(self):
+        for stream in getattr(self, '_streams', []):
+            await stream.close()
+        await super().close()
+
+
+def _set_shared_memory(parameters, region, byte_size, offset=0):
+    # The request parameters tritonclient's set_shared_memory() would send
+    parameters['shared_memory_region'].string_param = region
+    parameters['shared_memory_byte_size'].int64_param = byte_size
+    if offset:
+        parameters['shared_memory_offset'].int64_param = offset
+
+
+class _InferStream:
+    """One ModelStreamInfer call shared by concurrent requests.
+
+    The call is opened on first use and reopened after it fails; requests
+    waiting on a call that fails get its error.
+    """
+
+    def __init__(self, url):
+        self.channel = grpc.aio.insecure_channel(url, options=[
+            ('grpc.max_send_message_length', MAX_GRPC_MESSAGE_SIZE),
+            ('grpc.max_receive_message_length', MAX_GRPC_MESSAGE_SIZE)
+        ])
+        self.stub = service_pb2_grpc.GRPCInferenceServiceStub(self.channel)
+        self._ids = itertools.count()
+        self._requests = None
+        self._pending = {}
+        self._call = None
+        self._reader = None
+
+    async def infer(self, request, request_id=''):
+        # Triton echoes the ID back; keep the caller's ID in front for its logs
+        sequence = next(self._ids)
+        request.id = f"{request_id}#{sequence}" if request_id else str(sequence)
+        response = asyncio.get_running_loop().create_future()
+        self._pending[request.id] = response
+        self._open()
+        self._requests.put_nowait(request)
+        try:
+            return await response
+        finally:
+            # Gone either way; a late response for a cancelled request is dropped
+            self._pending.pop(request.id, None)
+
+    def _open(self):
+        if self._reader is not None and not self._reader.done():
+            return
+        self._requests = asyncio.Queue()
+        self._call = self.stub.ModelStreamInfer(self._send(self._requests))
+        self._reader = asyncio.create_task(self._receive(self._call, self._requests))
+
+    async def _send(self, requests):
+        while True:
+            request = await requests.get()
+            if request is None:
+                return
+            yield request
+
+    async def _receive(self, call, requests):
+        error = ConnectionError("Triton closed the inference stream")
+        try:
+            async for message in call:
+                response = self._pending.get(message.infer_response.id)
+                if response is None or response.done():
+                    continue
+                if message.error_message:
+                    response.set_exception(InferenceServerException(msg=message.error_message))
+                else:
+                    response.set_result(message.infer_response)
+        except grpc.aio.AioRpcError as e:
+            error = InferenceServerException(msg=e.details(), status=str(e.code()))
+            print(f"Triton inference stream failed: {e.details()}")
+        finally:
+            # Requests sent on this call get no answer now; the next one reopens it
+            requests.put_nowait(None)
+            if self._requests is requests:
+                self._reader = None
+            for request_id, response in list(self._pending.items()):
+                if not response.done():
+                    response.set_exception(error)
+
+    async def close(self):
+        if self._reader is not None:
+            self._call.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+        await self.channel.close()
+
+
+TRANSPORTS = {
+    transport.name: transport
+    for transport in (HttpTransport, GrpcTransport, GrpcStreamTransport)
+}
+
+
+def create_transport(name, url=None, **kwargs):
+    """Build the transport registered under `name` ('http', 'grpc' or 'grpc_stream')."""
+    try:
+        transport = TRANSPORTS[name]
+    except KeyError:
+        raise ValueError(f"Unknown Triton transport {name!r}; choose from {', '.join(TRANSPORTS)}")
+    return transport(url, **kwargs)